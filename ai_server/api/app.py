@@ -1,33 +1,45 @@
 #!/usr/bin/env python
 from __future__ import unicode_literals
-from nltk.tag import pos_tag
+from nltk.tag import pos_tag, pos_tag_sents
 from nltk.tokenize import sent_tokenize
 import numpy as np
 from collections import defaultdict
-from moviepy.editor import VideoFileClip, concatenate_videoclips
 import pysrt
-import chardet
-import yt_dlp
 import logging
+import re
 from pathlib import Path
-from typing import Tuple, List, Optional, Dict
+from typing import Callable, Iterator, Tuple, List, Optional, Dict
+import shutil
 import tempfile
+import uuid
 from datetime import datetime
 import sys
 import subprocess
 import argparse
+import threading
+from array import array
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+import render
+from subtitles import Cues, cues_from_pysrt, parse_subtitles
+from download_cache import DownloadCache, get_download_cache
+from telemetry import install_log_trace_ids, span, traced
+from batch import MANIFEST_FILE, PLAYLIST_RE, read_batch_file, run_batch
+from scorers import SCORERS, get_scorer
+from selection import select_regions
 
 import nltk
-nltk.download('punkt_tab')
-nltk.download('averaged_perceptron_tagger_eng')
+
+# moviepy and yt_dlp are slow to import, so they are imported where used
 
 
-#!/usr/bin/env python
 
-# Configure logging
+# Configure logging; records carry the trace ID of the request or job
+install_log_trace_ids()
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(levelname)s - trace=%(trace_id)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout),
         logging.FileHandler('video_summarizer.log')
@@ -36,11 +48,114 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def time_regions(regions: List[Tuple[float, float]]) -> float:
-    """Calculate total time duration for all regions."""
+# NLTK data package -> resource path checked before downloading
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'averaged_perceptron_tagger_eng': 'taggers/averaged_perceptron_tagger_eng',
+    'punkt': 'tokenizers/punkt',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+}
+_nltk_ready = False
+_nltk_lock = threading.Lock()
+
+
+def ensure_nltk_resources():
+    """Download missing NLTK data once per process; later calls are no-ops."""
+    global _nltk_ready
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+
+        missing = []
+        for package, resource in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                missing.append(package)
+
+        if missing:
+            import ssl
+            try:
+                _create_unverified_https_context = ssl._create_unverified_context
+            except AttributeError:
+                pass
+            else:
+                ssl._create_default_https_context = _create_unverified_https_context
+
+            for package in missing:
+                nltk.download(package, quiet=True)
+        _nltk_ready = True
+
+
+def warm_up_nltk():
+    """Load the tokenizer and tagger models so the first request doesn't pay for it."""
+    ensure_nltk_resources()
+    pos_tag_sents([nltk.word_tokenize(s) for s in sent_tokenize("Warm up the tagger.")])
+
+
+@lru_cache(maxsize=None)
+def check_external_dependencies() -> bool:
+    """Check once per process that required external tools are installed."""
+    dependencies = ['ffmpeg']
+
+    for dep in dependencies:
+        try:
+            subprocess.run([dep, '-version'], capture_output=True)
+        except FileNotFoundError:
+            logger.error(f"{dep} not found. Please install it first.")
+            return False
+    return True
+
+
+def time_regions(regions) -> float:
+    """Calculate total time duration for all regions (pairs or an (n, 2) array)."""
+    if isinstance(regions, np.ndarray):
+        if len(regions) == 0:
+            return 0.0
+        # cumsum adds sequentially, matching the built-in sum exactly
+        return float(np.cumsum(regions[:, 1] - regions[:, 0])[-1])
     return sum(end - start for start, end in regions)
 
 
+def pad_regions(regions: List[Tuple[float, float]], padding: float,
+                video_duration: Optional[float] = None) -> List[Tuple[float, float]]:
+    """Pad regions on both sides, clamp to the video and merge overlaps."""
+    padded = []
+    for start, end in sorted(regions):
+        start = max(0.0, start - padding)
+        end = end + padding
+        if video_duration:
+            end = min(end, video_duration)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], max(padded[-1][1], end))
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def remap_regions(regions: List[Tuple[float, float]],
+                  sections: List[Tuple[float, float, float]]) -> List[Tuple[float, float]]:
+    """
+    Map source-time regions onto a video made by joining downloaded sections.
+
+    sections holds (source_start, source_end, actual_duration) in order; each
+    region is clipped to the section its start falls in.
+    """
+    remapped = []
+    for start, end in sorted(regions):
+        offset = 0.0
+        for section_start, section_end, section_duration in sections:
+            if section_start <= start < section_end:
+                local_end = min(end, section_end) - section_start
+                local_end = min(local_end, section_duration)
+                remapped.append((offset + start - section_start, offset + local_end))
+                break
+            offset += section_duration
+        else:
+            logger.warning(f"Region {start}-{end} is outside the downloaded sections")
+    return remapped
+
+
 def srt_segment_to_range(segment: pysrt.SubRipItem) -> Tuple[float, float]:
     """Convert subtitle segment to time range in seconds."""
     start = segment.start.hours * 3600 + segment.start.minutes * \
@@ -50,7 +165,41 @@ def srt_segment_to_range(segment: pysrt.SubRipItem) -> Tuple[float, float]:
     return start, end
 
 
+def open_subtitles(subtitle_path: Path) -> Cues:
+    """Parse an SRT/VTT file into Cues, detecting its encoding from a prefix."""
+    return parse_subtitles(Path(subtitle_path))
+
+
+def as_cues(srt_file) -> Cues:
+    """Accept either Cues or a pysrt.SubRipFile."""
+    return srt_file if isinstance(srt_file, Cues) else cues_from_pysrt(srt_file)
+
+
+def subtitle_lines(srt_file) -> Iterator[Tuple[float, float, str]]:
+    """
+    Yield (start, end, line) for each distinct caption line.
+
+    Inline timing/style tags are removed and the repeated lines of rolling
+    auto-generated captions are kept only once.
+    """
+    cues = as_cues(srt_file)
+    previous = None
+    for i, text in enumerate(cues.texts()):
+        for line in re.sub(r'<[^>]+>', '', text).splitlines():
+            line = ' '.join(line.split())
+            if line and line != previous:
+                previous = line
+                yield float(cues.starts[i]), float(cues.ends[i]), line
+
+
+def subtitle_text(srt_file) -> str:
+    """Flatten subtitles into plain transcript text."""
+    return ' '.join(line for _, _, line in subtitle_lines(srt_file))
+
+
 class SentenceInfo:
+    __slots__ = ('text', 'start', 'end', 'duration', 'score')
+
     def __init__(self, text: str, start: float, end: float, duration: float, score: float = 0.0):
         self.text = text
         self.start = start
@@ -62,137 +211,245 @@ class SentenceInfo:
         return self.score < other.score
 
 
-def summarize(srt_file: pysrt.SubRipFile, max_summary_size: int) -> List[Tuple[float, float]]:
-    """
-    Create summary by extracting important segments based on:
-    - Sentence importance (presence of nouns, verbs)
-    - Segment duration
-    - Content density
-    """
-    # Convert subtitles to list of sentences with timing
-    sentences: List[SentenceInfo] = []
-    for segment in srt_file:
+class SentenceTable:
+    """Sentences stored column-wise: a list of texts plus timing arrays."""
+    __slots__ = ('texts', 'starts', 'ends', 'durations')
+
+    def __init__(self, texts: List[str], starts: np.ndarray, ends: np.ndarray, durations: np.ndarray):
+        self.texts = texts
+        self.starts = starts
+        self.ends = ends
+        self.durations = durations
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, i: int) -> SentenceInfo:
+        return SentenceInfo(self.texts[i], float(self.starts[i]), float(self.ends[i]),
+                            float(self.durations[i]))
+
+
+def split_sentences(srt_file) -> SentenceTable:
+    """Convert subtitles to sentences with timing."""
+    cues = as_cues(srt_file)
+    texts: List[str] = []
+    starts, ends, durations = array('d'), array('d'), array('d')
+
+    for i in range(len(cues)):
+        text = cues.text(i)
         # Split segment text into sentences
-        segment_sentences = sent_tokenize(segment.text)
+        segment_sentences = sent_tokenize(text)
         if not segment_sentences:
             continue
 
-        timing = srt_segment_to_range(segment)
-        duration = timing[1] - timing[0]
+        segment_start = float(cues.starts[i])
+        segment_end = float(cues.ends[i])
+        duration = segment_end - segment_start
 
         # Handle single sentence case
         if len(segment_sentences) == 1:
-            sentences.append(SentenceInfo(
-                text=segment_sentences[0],
-                start=timing[0],
-                end=timing[1],
-                duration=duration
-            ))
+            texts.append(segment_sentences[0])
+            starts.append(segment_start)
+            ends.append(segment_end)
+            durations.append(duration)
         else:
             # Distribute time proportionally for multiple sentences
-            time_per_char = duration / len(segment.text)
-            current_time = timing[0]
+            time_per_char = duration / len(text)
+            current_time = segment_start
 
             for sentence in segment_sentences:
                 sentence_duration = len(sentence) * time_per_char
-                sentences.append(SentenceInfo(
-                    text=sentence,
-                    start=current_time,
-                    end=current_time + sentence_duration,
-                    duration=sentence_duration
-                ))
+                texts.append(sentence)
+                starts.append(current_time)
+                ends.append(current_time + sentence_duration)
+                durations.append(sentence_duration)
                 current_time += sentence_duration
 
-    # Score sentences based on various factors
-    scored_sentences = []
-    for sentence in sentences:
+    return SentenceTable(texts, np.array(starts, dtype=np.float64),
+                         np.array(ends, dtype=np.float64),
+                         np.array(durations, dtype=np.float64))
+
+
+def _score_sentences_serial(sentences: SentenceTable) -> np.ndarray:
+    """Reference scorer that tags and scores one sentence at a time."""
+    scores = np.zeros(len(sentences), dtype=np.float64)
+    for i, (text, duration) in enumerate(zip(sentences.texts, sentences.durations.tolist())):
         # Analyze POS tags
-        tokens = pos_tag(nltk.word_tokenize(sentence.text))
+        tokens = pos_tag(nltk.word_tokenize(text))
         num_nouns = sum(1 for _, pos in tokens if pos.startswith('NN'))
         num_verbs = sum(1 for _, pos in tokens if pos.startswith('VB'))
 
         # Calculate scores
         content_score = (num_nouns + num_verbs) / len(tokens) if tokens else 0
         # Favor medium-length sentences
-        length_score = min(1.0, len(sentence.text) / 100)
+        length_score = min(1.0, len(text) / 100)
         # Favor segments 2-5 seconds
-        duration_score = min(1.0, sentence.duration / 5)
+        duration_score = min(1.0, duration / 5)
+
+        scores[i] = content_score * 0.4 + length_score * 0.3 + duration_score * 0.3
+    return scores
+
 
-        total_score = content_score * 0.4 + length_score * 0.3 + duration_score * 0.3
-        sentence.score = total_score
-        scored_sentences.append(sentence)
+def select_top_sentences(scores: np.ndarray, starts: np.ndarray, k: int) -> np.ndarray:
+    """
+    Pick the indices of the top k scores, ordered by start time.
 
-    # Sort by score and select top segments
-    scored_sentences.sort(reverse=True)
-    selected_sentences = scored_sentences[:max_summary_size]
+    Uses a partial selection (np.partition) instead of a full sort. Ties are
+    broken like a stable descending sort: equal scores keep their original
+    order, both when cutting at the k-th score and when ordering by start.
+    """
+    n = len(scores)
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    if k < n:
+        threshold = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        selected = np.concatenate((above, ties))
+    else:
+        selected = np.arange(n)
 
-    # Sort selected sentences by time
-    selected_sentences.sort(key=lambda x: x.start)
+    # Primary key start time, then descending score, then original position
+    order = np.lexsort((selected, -scores[selected], starts[selected]))
+    return selected[order]
 
-    # Merge overlapping or very close segments
-    merged_regions = []
-    if not selected_sentences:
-        return merged_regions
 
-    current_start = selected_sentences[0].start
-    current_end = selected_sentences[0].end
+def merge_intervals(starts: np.ndarray, ends: np.ndarray, gap: float = 0.5) -> List[Tuple[float, float]]:
+    """
+    Merge time-ordered intervals that overlap or are very close.
 
-    for sentence in selected_sentences[1:]:
-        if sentence.start - current_end <= 0.5:  # Merge if gap is less than 0.5s
-            current_end = sentence.end
-        else:
-            merged_regions.append((current_start, current_end))
-            current_start = sentence.start
-            current_end = sentence.end
+    An interval joins the previous one when it starts at most gap seconds
+    after the previous interval ends; the merged region ends where its last
+    interval ends.
+    """
+    if len(starts) == 0:
+        return []
+
+    # Merge if gap is less than 0.5s
+    breaks = np.flatnonzero(starts[1:] - ends[:-1] > gap) + 1
+    group_starts = np.concatenate(([0], breaks))
+    group_ends = np.concatenate((breaks - 1, [len(starts) - 1]))
+    return list(zip(starts[group_starts].tolist(), ends[group_ends].tolist()))
+
+
+def scored_sentences(srt_file, batched: bool = True,
+                     scorer: Optional[str] = None) -> Tuple[SentenceTable, np.ndarray]:
+    """
+    Split subtitles into sentences and score their importance.
+
+    scorer names one of scorers.SCORERS; the default heuristic rates
+    sentences based on:
+    - Sentence importance (presence of nouns, verbs)
+    - Segment duration
+    - Content density
+
+    srt_file may be Cues or a pysrt.SubRipFile. With batched=False every
+    sentence is tagged and scored on its own by the heuristic; this is kept
+    as the reference path for benchmarks and works with no other scorer.
+    """
+    score = get_scorer(scorer)
+    if not batched and score is not SCORERS['heuristic']:
+        raise ValueError("Unbatched scoring only supports the heuristic scorer")
+    ensure_nltk_resources()
+    with span("split_sentences"):
+        sentences = split_sentences(srt_file)
+    if not len(sentences):
+        return sentences, np.zeros(0, dtype=np.float64)
+
+    # Score sentences based on various factors
+    with span("score_sentences", scorer=score.__name__, sentences=len(sentences)):
+        if batched:
+            return sentences, score(sentences)
+        return sentences, _score_sentences_serial(sentences)
+
+
+def summarize(srt_file, max_summary_size: int, batched: bool = True,
+              scorer: Optional[str] = None) -> List[Tuple[float, float]]:
+    """Create summary from the max_summary_size best sentences, merged into regions."""
+    sentences, scores = scored_sentences(srt_file, batched, scorer)
+    if not len(sentences):
+        return []
+
+    # Select top segments, sorted by time
+    with span("select_regions"):
+        selected = select_top_sentences(scores, sentences.starts, max_summary_size)
+        return merge_intervals(sentences.starts[selected], sentences.ends[selected])
+
+
+def summarize_to_duration(srt_file, target_duration: float, video_duration: Optional[float] = None,
+                          batched: bool = True, scorer: Optional[str] = None) -> List[Tuple[float, float]]:
+    """
+    Create summary regions lasting at most target_duration seconds.
+
+    The sentences worth most within the budget are chosen by
+    selection.select_regions, which accounts for merged gaps and never
+    goes past video_duration.
+    """
+    sentences, scores = scored_sentences(srt_file, batched, scorer)
+    if not len(sentences):
+        return []
 
-    merged_regions.append((current_start, current_end))
-    return merged_regions
+    with span("select_regions", sentences=len(sentences)):
+        return select_regions(sentences.starts, sentences.ends, scores, target_duration, video_duration)
 
 
 class VideoSummarizer:
-    def __init__(self, output_dir: str = "output"):
+    def __init__(self, output_dir: str = "output", render_workers: Optional[int] = None,
+                 render_threads: Optional[int] = None, cache: Optional[DownloadCache] = None):
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
+        # Downloads are shared across summarizers; cleanup() never touches them
+        self.cache = cache or get_download_cache()
+        # Seconds added around each region for range downloads
+        self.range_padding = 2.0
+        # Process count and ffmpeg threads per process for the "parallel" render mode
+        self.render_workers = render_workers
+        self.render_threads = render_threads
+        # Frame height of preview renders
+        self.preview_height = render.PREVIEW_HEIGHT
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Each process_video call works in its own subdirectory, so one
+        # summarizer can be reused across (concurrent) requests
         self.temp_dir = Path(tempfile.mkdtemp())
         self.setup_nltk()
 
     def setup_nltk(self):
         """Setup NLTK with required packages."""
         try:
-            import ssl
-            try:
-                _create_unverified_https_context = ssl._create_unverified_context
-            except AttributeError:
-                pass
-            else:
-                ssl._create_default_https_context = _create_unverified_https_context
-
-            nltk.download('punkt', quiet=True)
-            nltk.download('averaged_perceptron_tagger', quiet=True)
+            ensure_nltk_resources()
         except Exception as e:
             logger.error(f"Failed to setup NLTK: {str(e)}")
             raise
 
     def check_dependencies(self) -> bool:
         """Check if required external dependencies are installed."""
-        dependencies = ['ffmpeg']
+        return check_external_dependencies()
 
-        for dep in dependencies:
-            try:
-                subprocess.run([dep, '-version'], capture_output=True)
-            except FileNotFoundError:
-                logger.error(f"{dep} not found. Please install it first.")
-                return False
-        return True
-
-    def download_video(self, url: str) -> Tuple[Optional[Path], Optional[Path]]:
-        """Download video and subtitles."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = self.temp_dir / f"video_{timestamp}"
+    def new_work_dir(self) -> Path:
+        """Create a scratch directory for one pipeline run."""
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(dir=self.temp_dir))
 
+    @contextmanager
+    def workspace(self, parent: Optional[Path] = None) -> Iterator[Path]:
+        """A fresh scratch directory (inside parent, if given) that is removed on exit, even on errors."""
+        work_dir = Path(tempfile.mkdtemp(dir=parent)) if parent else self.new_work_dir()
+        try:
+            yield work_dir
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def download_video(self, url: str, hold: Optional[ExitStack] = None
+                       ) -> Tuple[Optional[Path], Optional[Path]]:
+        """
+        Download video and subtitles through the shared download cache.
+
+        The files stay in the cache until hold is closed; keep it open for
+        as long as they are read.
+        """
         ydl_opts = {
             'format': 'best[ext=mp4]',
-            'outtmpl': str(base_filename) + '.%(ext)s',
             'writeautomaticsub': True,
             'subtitleslangs': ['en'],
             'postprocessors': [{
@@ -204,99 +461,174 @@ class VideoSummarizer:
         }
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                logger.info("Downloading video...")
-                print(type(url))
-                info = ydl.extract_info(url, download=True)
-                video_path = base_filename.with_suffix(f".{info['ext']}")
-                subtitle_path = base_filename.with_suffix(".en.srt")
+            logger.info("Downloading video...")
+            entry = self.cache.fetch(url, ydl_opts, hold)
+            video_path = entry['video_path']
+            subtitle_path = entry['subtitle_paths'].get(
+                'en', self.cache.entry_dir(entry['key']) / "media.en.srt")
 
-                if not video_path.exists():
-                    logger.error("Video download failed")
-                    return None, None
+            if not video_path or not video_path.exists():
+                logger.error("Video download failed")
+                return None, None
 
-                if not subtitle_path.exists():
-                    logger.warning(
-                        "No subtitles found, attempting auto-generation...")
-                    # Implement fallback subtitle generation here if needed
+            if not subtitle_path.exists():
+                logger.warning(
+                    "No subtitles found, attempting auto-generation...")
+                # Implement fallback subtitle generation here if needed
 
-                return video_path, subtitle_path
+            return video_path, subtitle_path
 
         except Exception as e:
             logger.error(f"Error downloading video: {str(e)}")
             return None, None
 
-    def process_subtitles(self, subtitle_path: Path, duration: int = 60) -> List[Tuple[float, float]]:
-        """Process subtitles and find summary regions."""
+    def download_subtitles(self, url: str, hold: Optional[ExitStack] = None
+                           ) -> Tuple[Optional[Path], Optional[float]]:
+        """
+        Download only the subtitles; returns the subtitle path and video
+        duration. The file stays in the cache until hold is closed.
+        """
+        ydl_opts = {
+            'skip_download': True,
+            'writeautomaticsub': True,
+            'subtitleslangs': ['en'],
+            'postprocessors': [{
+                'key': 'FFmpegSubtitlesConvertor',
+                'format': 'srt',
+            }],
+            'quiet': True,
+            'no_warnings': True
+        }
+
         try:
-            with open(subtitle_path, 'rb') as f:
-                enc = chardet.detect(f.read())['encoding'] or 'utf-8'
+            logger.info("Downloading subtitles...")
+            entry = self.cache.fetch(url, ydl_opts, hold)
+            subtitle_path = entry['subtitle_paths'].get('en')
+            if not subtitle_path or not subtitle_path.exists():
+                logger.error("No subtitles found")
+                return None, None
+            return subtitle_path, entry.get('duration')
 
-            srt_file = pysrt.open(str(subtitle_path), encoding=enc)
+        except Exception as e:
+            logger.error(f"Error downloading subtitles: {str(e)}")
+            return None, None
 
-            if len(srt_file) == 0:
-                logger.error("No subtitles found in file")
-                return []
+    def download_sections(self, url: str, ranges: List[Tuple[float, float]],
+                          work_dir: Optional[Path] = None) -> Tuple[Optional[Path], List[float]]:
+        """
+        Download only the given time ranges and join them into one video.
 
-            total_duration = time_regions(map(srt_segment_to_range, srt_file))
-            subtitle_duration = total_duration / len(srt_file)
-            n_sentences = max(1, int(duration / subtitle_duration))
+        Returns the joined video, whose timeline is the ranges back to back,
+        and the actual duration of each downloaded section.
+        """
+        import yt_dlp
+        from yt_dlp.utils import download_range_func
 
-            logger.info(f"Processing {len(srt_file)} subtitle entries...")
-            summary = summarize(srt_file, min(n_sentences, len(srt_file)))
+        section_dir = Path(tempfile.mkdtemp(dir=work_dir or self.new_work_dir()))
+        ydl_opts = {
+            'format': 'best[ext=mp4]',
+            'outtmpl': str(section_dir / 'section_%(section_start)s.%(ext)s'),
+            'download_ranges': download_range_func(None, ranges),
+            'force_keyframes_at_cuts': True,
+            'quiet': True,
+            'no_warnings': True
+        }
 
-            return self.optimize_regions(summary, duration)
+        try:
+            logger.info(f"Downloading {len(ranges)} sections ({time_regions(ranges):.1f}s)...")
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.extract_info(url, download=True)
+
+            sections = sorted(section_dir.glob('section_*.mp4'),
+                              key=lambda p: float(p.stem[len('section_'):]))
+            if len(sections) != len(ranges):
+                logger.error(f"Expected {len(ranges)} sections, got {len(sections)}")
+                return None, []
+
+            joined_path = section_dir / "sections.mp4"
+            render.concat_segments(sections, joined_path)
+            durations = [render.probe_stream_info(p)['duration'] for p in sections]
+            return joined_path, durations
+
+        except Exception as e:
+            logger.error(f"Error downloading video sections: {str(e)}")
+            return None, []
+
+    @traced("process_subtitles")
+    def process_subtitles(self, subtitle_path: Path, duration: int = 60,
+                          video_duration: Optional[float] = None,
+                          scorer: Optional[str] = None) -> List[Tuple[float, float]]:
+        """
+        Process subtitles and find summary regions of at most duration
+        seconds, ranking sentences with the named scorer.
+        """
+        try:
+            with span("parse_subtitles"):
+                cues = open_subtitles(subtitle_path)
+
+            if len(cues) == 0:
+                logger.error("No subtitles found in file")
+                return []
+
+            logger.info(f"Processing {len(cues)} subtitle entries...")
+            return summarize_to_duration(cues, duration, video_duration, scorer=scorer)
 
         except Exception as e:
             logger.error(f"Error processing subtitles: {str(e)}")
             return []
 
-    def optimize_regions(self, regions: List[Tuple[float, float]], target_duration: int) -> List[Tuple[float, float]]:
-        """Optimize video regions to match target duration."""
-        if not regions:
+    def optimize_regions(self, regions, target_duration: int,
+                         video_duration: Optional[float] = None) -> List[Tuple[float, float]]:
+        """
+        Fit unscored regions (pairs or an (n, 2) array) to the target duration.
+
+        All regions count as equally important, so on overshoot the longest
+        ones that fit are kept; on undershoot they are padded into the gaps
+        around them, never past video_duration.
+        """
+        regions = np.asarray(regions, dtype=np.float64).reshape(-1, 2)
+        if len(regions) == 0:
             return []
-
-        total_duration = sum(end - start for start, end in regions)
-
-        if abs(total_duration - target_duration) <= 5:  # Within 5 seconds tolerance
-            return regions
-
-        if total_duration < target_duration:
-            # Extend regions proportionally
-            ratio = target_duration / total_duration
-            optimized = []
-            for start, end in regions:
-                duration = end - start
-                new_duration = duration * ratio
-                extension = (new_duration - duration) / 2
-                optimized.append((max(0, start - extension), end + extension))
-            return optimized
-        else:
-            # Trim regions to fit target duration
-            regions.sort(key=lambda x: x[1] - x[0], reverse=True)
-            optimized = []
-            current_duration = 0
-
-            for start, end in regions:
-                duration = end - start
-                if current_duration + duration <= target_duration:
-                    optimized.append((start, end))
-                    current_duration += duration
-                else:
-                    remaining = target_duration - current_duration
-                    if remaining > 0:
-                        optimized.append((start, start + remaining))
-                    break
-
-            return sorted(optimized, key=lambda x: x[0])
-
-    def create_summary_video(self, video_path: Path, regions: List[Tuple[float, float]], output_filename: str) -> Optional[Path]:
-        """Create summary video from selected regions."""
+        return select_regions(regions[:, 0], regions[:, 1], np.ones(len(regions)),
+                              target_duration, video_duration)
+
+    def create_summary_video(self, video_path: Path, regions: List[Tuple[float, float]], output_filename: str,
+                             render_mode: str = "reencode", frame_accurate: bool = False,
+                             work_dir: Optional[Path] = None,
+                             on_output: Optional[Callable[[Path], None]] = None) -> Optional[Path]:
+        """
+        Create summary video from selected regions.
+
+        render_mode "reencode" decodes and re-encodes everything with moviepy;
+        "fast_cut" stream copies keyframe-aligned segments with ffmpeg and
+        re-encodes only the boundary GOPs when frame_accurate is set;
+        "parallel" encodes every region in its own process and concatenates
+        the pieces losslessly; "hls" publishes an HLS playlist region by
+        region (on_output gets its path once the first region is playable)
+        and remuxes it to MP4 at the end. Scratch files go under work_dir.
+        """
+        own_work_dir = work_dir is None
+        work_dir = work_dir or self.new_work_dir()
         try:
             if not regions:
                 logger.error("No regions to process")
                 return None
 
+            if render_mode == "fast_cut":
+                return self.create_summary_video_fast(
+                    video_path, regions, output_filename, frame_accurate, work_dir)
+            if render_mode == "parallel":
+                return self.create_summary_video_parallel(
+                    video_path, regions, output_filename, work_dir)
+            if render_mode == "hls":
+                return self.create_summary_video_hls(
+                    video_path, regions, output_filename, work_dir, on_output)
+            if render_mode != "reencode":
+                logger.error(f"Unknown render mode: {render_mode}")
+                return None
+
+            from moviepy.editor import VideoFileClip, concatenate_videoclips
+
             logger.info("Creating video summary...")
             with VideoFileClip(str(video_path)) as video:
                 clips = []
@@ -321,7 +653,7 @@ class VideoSummarizer:
                     str(output_path),
                     codec="libx264",
                     audio_codec="aac",
-                    temp_audiofile=str(self.temp_dir / "temp_audio.m4a"),
+                    temp_audiofile=str(work_dir / "temp_audio.m4a"),
                     remove_temp=True
                 )
 
@@ -331,54 +663,287 @@ class VideoSummarizer:
             logger.error(f"Error creating summary video: {str(e)}")
             return None
 
-    def cleanup(self):
-        """Clean up temporary files."""
+        finally:
+            if own_work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    def create_summary_video_fast(self, video_path: Path, regions: List[Tuple[float, float]], output_filename: str,
+                                  frame_accurate: bool = False, work_dir: Optional[Path] = None) -> Optional[Path]:
+        """Create summary video by stream copying keyframe-aligned segments."""
+        with self.workspace(work_dir) as work_dir:
+            try:
+                output_path = self.output_dir / output_filename
+                logger.info(f"Fast cutting {len(regions)} regions to {output_path}")
+                return render.fast_cut(video_path, regions, output_path, work_dir, frame_accurate)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"ffmpeg failed while cutting video: {e.stderr}")
+                return None
+            except Exception as e:
+                logger.error(f"Error creating fast summary video: {str(e)}")
+                return None
+
+    def create_summary_video_parallel(self, video_path: Path, regions: List[Tuple[float, float]],
+                                      output_filename: str, work_dir: Optional[Path] = None) -> Optional[Path]:
+        """Create summary video by encoding regions in a process pool."""
+        with self.workspace(work_dir) as work_dir:
+            try:
+                output_path = self.output_dir / output_filename
+                return render.parallel_encode(
+                    video_path, regions, output_path, work_dir,
+                    self.render_workers, self.render_threads)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"ffmpeg failed while encoding video: {e.stderr}")
+                return None
+            except Exception as e:
+                logger.error(f"Error creating parallel summary video: {str(e)}")
+                return None
+
+    def preview_path(self, output_filename: str) -> Path:
+        """Where the preview of output_filename is written."""
+        return self.output_dir / f"{Path(output_filename).stem}.preview.mp4"
+
+    def create_preview_video(self, video_path: Path, regions: List[Tuple[float, float]],
+                             output_filename: str, work_dir: Optional[Path] = None) -> Optional[Path]:
+        """
+        Quickly render a low-resolution preview of regions, to check them
+        before the full-quality render is done.
+        """
+        with self.workspace(work_dir) as work_dir:
+            try:
+                preview_path = self.preview_path(output_filename)
+                logger.info(f"Rendering {self.preview_height}p preview of {len(regions)} regions")
+                return render.parallel_encode(
+                    video_path, regions, preview_path, work_dir,
+                    self.render_workers, self.render_threads, preview_height=self.preview_height)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"ffmpeg failed while rendering preview: {e.stderr}")
+                return None
+            except Exception as e:
+                logger.error(f"Error creating preview video: {str(e)}")
+                return None
+
+    def hls_playlist_path(self, output_filename: str) -> Path:
+        """Where the HLS rendition of output_filename is published."""
+        return self.output_dir / Path(output_filename).stem / "index.m3u8"
+
+    def create_summary_video_hls(self, video_path: Path, regions: List[Tuple[float, float]],
+                                 output_filename: str, work_dir: Optional[Path] = None,
+                                 on_output: Optional[Callable[[Path], None]] = None) -> Optional[Path]:
+        """
+        Create summary video progressively as HLS, then remux it to MP4.
+
+        The HLS rendition (hls_playlist_path) is kept next to the MP4 on
+        purpose: its playlist is handed out as soon as the first region is
+        published, players may still be part-way through it when the MP4
+        is ready, and its segments are served as immutable. Like the MP4,
+        it is never removed by the summarizer.
+        """
+        def published(playlist_path: Path, done: int, total: int):
+            logger.info(f"Published {done}/{total} regions to {playlist_path}")
+            if done == 1 and on_output:
+                on_output(playlist_path)
+
+        with self.workspace(work_dir) as work_dir:
+            try:
+                playlist_path = render.hls_encode(
+                    video_path, regions, self.hls_playlist_path(output_filename), work_dir,
+                    threads=self.render_threads, on_update=published)
+                return render.hls_to_mp4(playlist_path, self.output_dir / output_filename)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"ffmpeg failed while encoding HLS video: {e.stderr}")
+                return None
+            except Exception as e:
+                logger.error(f"Error creating HLS summary video: {str(e)}")
+                return None
+
+    def cleanup(self, work_dir: Optional[Path] = None):
+        """Clean up temporary files of one run, or all of them."""
         try:
-            import shutil
-            shutil.rmtree(self.temp_dir)
+            shutil.rmtree(work_dir or self.temp_dir)
             logger.info("Cleaned up temporary files")
         except Exception as e:
             logger.warning(f"Failed to clean up temporary files: {str(e)}")
 
-    def process_video(self, url: str, duration: int = 60) -> Optional[Path]:
-        """Main processing pipeline."""
-        try:
-            if not self.check_dependencies():
-                return None
+    def fetch_inputs(self, url: str, range_download: bool = False, hold: Optional[ExitStack] = None
+                     ) -> Tuple[Optional[Path], Optional[Path], Optional[float]]:
+        """
+        Fetch what region selection needs: (video_path, subtitle_path, video_duration).
+
+        With range_download only the subtitles are fetched and video_path is
+        None. video_duration is None if it is unknown. The cached files are
+        protected from eviction until hold is closed, so keep it open
+        through rendering.
+        """
+        if range_download:
+            with span("download_subtitles"):
+                subtitle_path, video_duration = self.download_subtitles(url, hold)
+            return None, subtitle_path, video_duration
+
+        with span("download_video"):
+            video_path, subtitle_path = self.download_video(url, hold)
+        video_duration = None
+        if video_path:
+            try:
+                video_duration = render.probe_stream_info(video_path)['duration'] or None
+            except Exception as e:
+                logger.warning(f"Could not probe video duration: {str(e)}")
+        return video_path, subtitle_path, video_duration
+
+    def render_regions(self, url: str, regions: List[Tuple[float, float]], video_path: Optional[Path],
+                       video_duration: Optional[float] = None, render_mode: str = "reencode",
+                       frame_accurate: bool = False, work_dir: Optional[Path] = None,
+                       on_output: Optional[Callable[[Path], None]] = None,
+                       progress: Optional[Callable[[str, float], None]] = None,
+                       on_preview: Optional[Callable[[Path], None]] = None) -> Optional[Path]:
+        """
+        Render the summary video of regions.
+
+        Without a video_path (range downloads) only the regions, plus
+        padding, are downloaded first. With on_preview, a low-resolution
+        preview is rendered before the full video and passed to it. Scratch
+        files go in a workspace under work_dir.
+        """
+        report = progress or (lambda stage, fraction: None)
+        with self.workspace(work_dir) as work_dir:
+            if video_path is None:
+                report("downloading_sections", 0.3)
+                ranges = pad_regions(regions, self.range_padding, video_duration)
+                with span("download_sections", sections=len(ranges)):
+                    video_path, section_durations = self.download_sections(url, ranges, work_dir)
+                if not video_path:
+                    return None
 
-            video_path, subtitle_path = self.download_video(url)
-            if not video_path or not subtitle_path:
-                return None
+                sections = [(start, end, section_duration) for (start, end), section_duration
+                            in zip(ranges, section_durations)]
+                regions = remap_regions(regions, sections)
+
+            # Unique suffix so concurrent jobs never share an output file
+            output_filename = (f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                               f"_{uuid.uuid4().hex[:8]}.mp4")
+            if on_preview:
+                report("rendering_preview", 0.45)
+                with span("render_preview", regions=len(regions)):
+                    preview_path = self.create_preview_video(video_path, regions, output_filename,
+                                                             work_dir)
+                # A failed preview only means waiting for the full render
+                if preview_path:
+                    on_preview(preview_path)
+
+            report("rendering", 0.5)
+            with span("render", mode=render_mode, regions=len(regions)):
+                return self.create_summary_video(
+                    video_path, regions, output_filename, render_mode, frame_accurate, work_dir,
+                    on_output)
+
+    @traced("process_video")
+    def process_video(self, url: str, duration: int = 60, render_mode: str = "reencode",
+                      frame_accurate: bool = False, range_download: bool = False,
+                      progress: Optional[Callable[[str, float], None]] = None,
+                      on_output: Optional[Callable[[Path], None]] = None,
+                      on_preview: Optional[Callable[[Path], None]] = None,
+                      scorer: Optional[str] = None) -> Optional[Path]:
+        """
+        Main processing pipeline.
+
+        With range_download, only the subtitles are fetched first; after the
+        regions are chosen, just those time ranges (plus padding) are
+        downloaded and rendered. progress, if given, is called with
+        (stage, fraction) as the pipeline advances; on_output is passed on
+        to create_summary_video. With on_preview, a quick low-resolution
+        preview is rendered first and passed to it. scorer names the
+        sentence scorer (see scorers.SCORERS).
+        """
+        report = progress or (lambda stage, fraction: None)
+        # hold keeps the cached downloads from being evicted while they are rendered
+        with self.workspace() as work_dir, ExitStack() as hold:
+            try:
+                if not self.check_dependencies():
+                    return None
 
-            regions = self.process_subtitles(subtitle_path, duration)
-            if not regions:
-                return None
+                report("downloading_subtitles" if range_download else "downloading", 0.05)
+                video_path, subtitle_path, video_duration = self.fetch_inputs(url, range_download, hold)
+                if not subtitle_path or not (video_path or range_download):
+                    return None
 
-            output_filename = f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-            result_path = self.create_summary_video(
-                video_path, regions, output_filename)
+                report("processing_subtitles", 0.2 if range_download else 0.4)
+                regions = self.process_subtitles(subtitle_path, duration, video_duration, scorer)
+                if not regions:
+                    return None
 
-            self.cleanup()
-            return result_path
+                return self.render_regions(url, regions, video_path, video_duration, render_mode,
+                                           frame_accurate, work_dir, on_output, report, on_preview)
 
-        except Exception as e:
-            logger.error(f"Error in processing pipeline: {str(e)}")
-            self.cleanup()
-            return None
+            except Exception as e:
+                logger.error(f"Error in processing pipeline: {str(e)}")
+                return None
 
 
 def main():
     parser = argparse.ArgumentParser(
         description='Create a summary of a YouTube video')
-    parser.add_argument('url', help='YouTube video URL')
+    parser.add_argument('url', nargs='?', help='YouTube video or playlist URL')
+    parser.add_argument('--batch', type=str, default=None,
+                        help='File with one video or playlist URL per line')
+    parser.add_argument('--jobs', type=int, default=2,
+                        help='Videos downloaded and rendered at a time in batch mode (default: 2)')
     parser.add_argument('--duration', type=int, default=60,
                         help='Target duration of the summary in seconds (default: 60)')
     parser.add_argument('--output-dir', type=str, default='output',
                         help='Output directory for the summary video')
+    parser.add_argument('--scorer', choices=sorted(SCORERS), default=None,
+                        help='How sentences are ranked (default: heuristic, or SUMMARY_SCORER)')
+    parser.add_argument('--fast-cut', action='store_true',
+                        help='Cut at keyframes with stream copy instead of re-encoding')
+    parser.add_argument('--frame-accurate', action='store_true',
+                        help='With --fast-cut, re-encode boundary GOPs for exact cuts')
+    parser.add_argument('--range-download', action='store_true',
+                        help='Fetch subtitles first and download only the selected ranges')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Encode each region in its own process')
+    parser.add_argument('--hls', action='store_true',
+                        help='Publish an HLS playlist while rendering, then an MP4')
+    parser.add_argument('--preview', action='store_true',
+                        help='Render a quick low-resolution preview before the full video')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Encoder processes for --parallel (default: CPU count)')
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help='ffmpeg threads per encoder process (default: CPUs / workers)')
     args = parser.parse_args()
-
-    summarizer = VideoSummarizer(output_dir=args.output_dir)
-    result_path = summarizer.process_video(args.url, args.duration)
+    if not args.url and not args.batch:
+        parser.error('a URL or --batch file is required')
+
+    if args.fast_cut:
+        render_mode = "fast_cut"
+    elif args.parallel:
+        render_mode = "parallel"
+    elif args.hls:
+        render_mode = "hls"
+    else:
+        render_mode = "reencode"
+    summarizer = VideoSummarizer(output_dir=args.output_dir, render_workers=args.workers,
+                                 render_threads=args.threads_per_worker)
+
+    if args.batch or PLAYLIST_RE.search(args.url):
+        urls = read_batch_file(args.batch) if args.batch else []
+        if args.url:
+            urls.append(args.url)
+        results = run_batch(summarizer, urls, args.duration, render_mode, args.frame_accurate,
+                            args.range_download, args.jobs, scorer=args.scorer)
+        summarizer.cleanup()
+        for result in results:
+            note = ' (from an earlier run)' if result['resumed'] else ''
+            print(f"{result['status']:>6}  {result['url']}  {result['path'] or result.get('error')}{note}")
+        failed = sum(1 for result in results if result['status'] != 'done')
+        print(f"\n{len(results) - failed} of {len(results)} summary videos created; "
+              f"results are recorded in {summarizer.output_dir / MANIFEST_FILE}")
+        return
+
+    result_path = summarizer.process_video(
+        args.url, args.duration, render_mode, args.frame_accurate, args.range_download,
+        on_output=lambda playlist: print(f"\nPlayback can start: {playlist}"),
+        on_preview=(lambda preview: print(f"\nPreview ready: {preview}")) if args.preview else None,
+        scorer=args.scorer)
+    summarizer.cleanup()
 
     if result_path:
         print(f"\nSummary video created successfully: {result_path}")
@@ -0,0 +1,302 @@
+"""Batch and playlist summarization through a bounded, staged pipeline."""
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telemetry import in_context, span
+
+if TYPE_CHECKING:
+    from app import VideoSummarizer
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.jsonl"
+# URLs worth asking yt_dlp to expand; anything else is taken as a single video
+PLAYLIST_RE = re.compile(r'[?&]list=|/playlist\b|/channel/|/c/|/user/|/@')
+
+# Marks the end of a stage's input
+_DONE = object()
+# How often a blocked put checks that the next stage still has live workers
+PUT_POLL_SECONDS = 0.5
+
+
+def read_batch_file(path: str) -> List[str]:
+    """URLs from a batch file, one per line; blank lines and # comments are skipped."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def expand_playlists(urls: Iterable[str]) -> List[str]:
+    """Replace playlist/channel URLs by their video URLs, dropping duplicates."""
+    expanded = []
+    for url in urls:
+        if not PLAYLIST_RE.search(url):
+            expanded.append(url)
+            continue
+
+        import yt_dlp
+
+        try:
+            with span("expand_playlist"), yt_dlp.YoutubeDL(
+                    {'extract_flat': 'in_playlist', 'quiet': True, 'no_warnings': True}) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except Exception as e:
+            logger.error(f"Could not expand playlist {url}: {str(e)}")
+            expanded.append(url)
+            continue
+
+        if info.get('_type') != 'playlist':
+            expanded.append(url)
+            continue
+        entries = [entry.get('webpage_url') or entry.get('url')
+                   for entry in info.get('entries') or [] if entry]
+        logger.info(f"Playlist {url} has {len(entries)} videos")
+        expanded.extend(entry for entry in entries if entry)
+    return list(dict.fromkeys(expanded))
+
+
+class Manifest:
+    """
+    Append-only JSON-lines record of batch item results.
+
+    Items are keyed by URL and summary parameters; the last line for a key
+    wins. Each finished item is flushed as it completes, so a rerun after an
+    interruption skips everything that was already rendered.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.records: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from a killed run
+                    self.records[record['key']] = record
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def make_key(url: str, params: Dict) -> str:
+        return json.dumps([url, params], sort_keys=True)
+
+    def finished(self, key: str) -> Optional[Dict]:
+        """The record of a completed item whose output still exists."""
+        with self._lock:
+            record = self.records.get(key)
+        if record and record['status'] == 'done' and Path(record['path']).exists():
+            return record
+        return None
+
+    def record(self, key: str, **fields) -> Dict:
+        record = dict(fields, key=key, updated=time.time())
+        with self._lock:
+            self.records[key] = record
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        return record
+
+
+class StagedPipeline:
+    """
+    Run items through named stages, each on its own worker threads.
+
+    Stages are connected by queues holding at most `bound` items, so a fast
+    stage (downloads) cannot run arbitrarily far ahead of a slow one
+    (rendering). A stage function returns True to pass the item on;
+    returning False or raising drops it, and on_done(item, stage, error)
+    is called for every item that finished the last stage (error None) or
+    was dropped. Errors from on_done are logged, and if a stage's workers
+    all die anyway, items queued for it are dropped instead of blocking
+    the stages before it.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], bool], int]], bound: int = 2):
+        self.stages = stages
+        self.bound = max(1, bound)
+
+    def run(self, items: Iterable[Any], on_done: Callable[[Any, str, Optional[str]], None]):
+        queues = [queue.Queue(maxsize=self.bound) for _ in self.stages]
+        threads: List[List[threading.Thread]] = []
+
+        def done(item: Any, stage: str, error: Optional[str]):
+            try:
+                on_done(item, stage, error)
+            except Exception as e:
+                logger.error(f"Batch completion handler failed after stage {stage}: {str(e)}")
+
+        def put(index: int, item: Any):
+            """Queue item for stage index, dropping it if that stage has no live workers."""
+            while True:
+                try:
+                    queues[index].put(item, timeout=PUT_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    if any(thread.is_alive() for thread in threads[index]):
+                        continue
+                name = self.stages[index][0]
+                logger.error(f"Batch stage {name} has no live workers; dropping queued item")
+                if item is not _DONE:
+                    done(item, name, f"{name} stopped")
+                return
+
+        def worker(index: int):
+            name, fn, _ = self.stages[index]
+            while True:
+                item = queues[index].get()
+                if item is _DONE:
+                    return
+                try:
+                    error = None if fn(item) else f"{name} failed"
+                except Exception as e:
+                    logger.error(f"Batch stage {name} failed: {str(e)}")
+                    error = f"{name} failed: {str(e)}"
+                if error or index == len(self.stages) - 1:
+                    done(item, name, error)
+                else:
+                    put(index + 1, item)
+
+        for index, (name, _, workers) in enumerate(self.stages):
+            stage_threads = [threading.Thread(target=in_context(worker), args=(index,),
+                                              name=f"batch-{name}-{i}", daemon=True)
+                             for i in range(max(1, workers))]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        def feed():
+            for item in items:
+                put(0, item)
+            for _ in threads[0]:
+                put(0, _DONE)
+
+        feeder = threading.Thread(target=in_context(feed), name="batch-feed", daemon=True)
+        feeder.start()
+        # Each stage is closed once everything before it has drained
+        for index, stage_threads in enumerate(threads):
+            for thread in stage_threads:
+                thread.join()
+            if index + 1 < len(threads):
+                for _ in threads[index + 1]:
+                    put(index + 1, _DONE)
+        feeder.join()
+        # Items left behind by a stage whose workers died
+        for (name, _, _), stage_queue in zip(self.stages, queues):
+            while not stage_queue.empty():
+                item = stage_queue.get_nowait()
+                if item is not _DONE:
+                    done(item, name, f"{name} stopped")
+
+
+class BatchItem:
+    """One video of a batch and the intermediate results of its stages."""
+
+    def __init__(self, index: int, url: str, key: str):
+        self.index = index
+        self.url = url
+        self.key = key
+        self.video_path: Optional[Path] = None
+        self.subtitle_path: Optional[Path] = None
+        self.video_duration: Optional[float] = None
+        self.regions: List[Tuple[float, float]] = []
+        self.path: Optional[Path] = None
+        # Keeps the cached downloads from being evicted until the item is done
+        self.hold = ExitStack()
+
+
+def run_batch(summarizer: 'VideoSummarizer', urls: Iterable[str], duration: int = 60,
+              render_mode: str = "reencode", frame_accurate: bool = False,
+              range_download: bool = False, jobs: int = 2, manifest_path: Optional[Path] = None,
+              progress: Optional[Callable[[str, float], None]] = None,
+              on_item: Optional[Callable[[Dict], None]] = None,
+              scorer: Optional[str] = None) -> List[Dict]:
+    """
+    Summarize many videos (playlist URLs are expanded) with one summarizer.
+
+    Downloads, subtitle processing and rendering run as separate stages:
+    `jobs` download and render workers, one selection worker (it is CPU
+    bound and holds the GIL). Items already in the manifest are skipped.
+    Returns one result dict per video, in input order; on_item is called
+    with each as it finishes. scorer names the sentence scorer.
+    """
+    report = progress or (lambda stage, fraction: None)
+    if not summarizer.check_dependencies():
+        raise RuntimeError("ffmpeg is required for batch summarization")
+
+    report("expanding", 0.0)
+    urls = expand_playlists(urls)
+    params = {'duration': duration, 'render_mode': render_mode,
+              'frame_accurate': frame_accurate, 'range_download': range_download}
+    if scorer:
+        # Only when set, so manifests of earlier runs still match
+        params['scorer'] = scorer
+    manifest = Manifest(manifest_path or summarizer.output_dir / MANIFEST_FILE)
+
+    results: List[Optional[Dict]] = [None] * len(urls)
+    pending = []
+    for index, url in enumerate(urls):
+        key = Manifest.make_key(url, params)
+        record = manifest.finished(key)
+        if record:
+            results[index] = {'url': url, 'status': 'done', 'path': record['path'], 'resumed': True}
+        else:
+            pending.append(BatchItem(index, url, key))
+    logger.info(f"Batch of {len(urls)} videos, {len(urls) - len(pending)} already done")
+
+    lock = threading.Lock()
+    done_count = [len(urls) - len(pending)]
+
+    def fetch(item: BatchItem) -> bool:
+        item.video_path, item.subtitle_path, item.video_duration = summarizer.fetch_inputs(
+            item.url, range_download, item.hold)
+        return bool(item.subtitle_path and (item.video_path or range_download))
+
+    def select(item: BatchItem) -> bool:
+        item.regions = summarizer.process_subtitles(item.subtitle_path, duration,
+                                                    item.video_duration, scorer)
+        return bool(item.regions)
+
+    def render(item: BatchItem) -> bool:
+        item.path = summarizer.render_regions(item.url, item.regions, item.video_path,
+                                              item.video_duration, render_mode, frame_accurate)
+        return item.path is not None
+
+    def finished(item: BatchItem, stage: str, error: Optional[str]):
+        item.hold.close()
+        status = 'failed' if error else 'done'
+        path = str(item.path) if item.path else None
+        manifest.record(item.key, url=item.url, status=status, stage=stage, path=path, error=error)
+        result = {'url': item.url, 'status': status, 'path': path, 'resumed': False}
+        if error:
+            result['error'] = error
+        with lock:
+            results[item.index] = result
+            done_count[0] += 1
+            fraction = done_count[0] / len(urls)
+        logger.info(f"Batch item {item.url} {status} ({done_count[0]}/{len(urls)})")
+        report("summarizing", fraction)
+        if on_item:
+            on_item(result)
+
+    jobs = max(1, jobs)
+    pipeline = StagedPipeline([('download', fetch, jobs), ('select', select, 1),
+                               ('render', render, jobs)], bound=jobs)
+    with span("batch", videos=len(urls), pending=len(pending)):
+        pipeline.run(pending, finished)
+    for item in pending:
+        # Lost with a worker that died mid-item
+        if results[item.index] is None:
+            item.hold.close()
+            results[item.index] = {'url': item.url, 'status': 'failed', 'path': None,
+                                   'resumed': False, 'error': 'batch pipeline stopped'}
+    return results
@@ -0,0 +1,301 @@
+"""Shared on-disk cache for downloaded videos and subtitles."""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from telemetry import download_bytes, download_cache_requests, span
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; locking becomes per-process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+# yt_dlp options that change which files an entry holds; each combination is its own entry
+VARIANT_OPTIONS = ('format', 'merge_output_format', 'skip_download', 'writesubtitles',
+                   'writeautomaticsub', 'subtitleslangs', 'subtitlesformat', 'postprocessors')
+
+
+@contextmanager
+def file_lock(path: Path, blocking: bool = True, shared: bool = False):
+    """
+    Hold an advisory lock on path, shared across processes: exclusive by
+    default, or shared with other shared holders. A non-blocking attempt
+    on a held lock raises BlockingIOError.
+    """
+    with open(path, 'a+') as f:
+        if fcntl:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class DownloadCache:
+    """
+    Content-addressed download cache keyed by extractor, video ID and format.
+
+    Each entry is a directory holding the media files plus meta.json.
+    Entries are evicted least-recently-used first once the total size
+    exceeds max_bytes, except entries someone is still reading: using()
+    holds a shared lock on the entry until its block exits.
+    """
+
+    def __init__(self, root: str = "download_cache", max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.lock_dir = self.root / ".locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(extractor: str, video_id: str, variant: Dict) -> str:
+        """Build the cache key; variant holds the VARIANT_OPTIONS of the request."""
+        digest = hashlib.sha1(json.dumps(variant, sort_keys=True).encode()).hexdigest()[:12]
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in video_id)
+        return f"{extractor.lower()}-{safe_id}-{digest}"
+
+    def entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    @contextmanager
+    def locked(self, key: str):
+        """Exclusive lock for filling a single entry."""
+        with file_lock(self.lock_dir / f"{key}.lock"):
+            yield
+
+    @contextmanager
+    def in_use(self, key: str):
+        """Shared lock that keeps an entry from being evicted or replaced."""
+        with file_lock(self.lock_dir / f"{key}.use", shared=True):
+            yield
+
+    def url_alias_path(self, url: str, variant: Dict) -> Path:
+        """Where the cache key of url is remembered, so hits skip the network probe."""
+        digest = hashlib.sha1(json.dumps([url, variant], sort_keys=True).encode()).hexdigest()
+        return self.lock_dir / f"url-{digest}.key"
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """Return entry metadata with absolute paths, or None on a miss."""
+        meta_path = self.entry_dir(key) / META_FILE
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count('misses')
+            return None
+
+        meta['last_access'] = time.time()
+        try:
+            self._write_meta(key, meta)
+        except OSError:
+            # Evicted between reading and touching it
+            self._count('misses')
+            return None
+        self._count('hits')
+        return self._resolve(key, meta)
+
+    def store(self, key: str, staging_dir: Path, meta: Dict) -> Dict:
+        """Move a filled staging directory into place and evict if needed."""
+        target = self.entry_dir(key)
+        if target.exists():
+            # A broken leftover (lookup() missed it); wait for anyone still reading it
+            with file_lock(self.lock_dir / f"{key}.use"):
+                shutil.rmtree(target)
+        meta = dict(meta)
+        meta['created'] = meta['last_access'] = time.time()
+        meta['size'] = sum(p.stat().st_size for p in staging_dir.rglob('*') if p.is_file())
+        with open(staging_dir / META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(staging_dir, target)
+
+        self.evict(keep=key)
+        return self._resolve(key, meta)
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least-recently-used entries until the cache fits max_bytes."""
+        with file_lock(self.lock_dir / ".evict.lock"):
+            entries = []
+            for meta_path in self._meta_paths():
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                entries.append((meta.get('last_access', 0), meta_path.parent.name, meta.get('size', 0)))
+
+            total = sum(size for _, _, size in entries)
+            for _, key, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                try:
+                    # Skip entries another worker is filling or reading right now
+                    with file_lock(self.lock_dir / f"{key}.lock", blocking=False), \
+                            file_lock(self.lock_dir / f"{key}.use", blocking=False):
+                        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+                except BlockingIOError:
+                    continue
+                total -= size
+                self._count('evictions')
+                logger.info(f"Evicted {key} from download cache")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process plus current cache size."""
+        sizes = []
+        for meta_path in self._meta_paths():
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    sizes.append(json.load(f).get('size', 0))
+            except (OSError, json.JSONDecodeError):
+                continue
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(sizes),
+            'bytes': sum(sizes),
+            'max_bytes': self.max_bytes,
+        }
+
+    @contextmanager
+    def using(self, url: str, ydl_opts: Dict) -> Iterator[Optional[Dict]]:
+        """fetch() whose entry cannot be evicted until the block exits."""
+        with ExitStack() as hold:
+            yield self.fetch(url, ydl_opts, hold)
+
+    def fetch(self, url: str, ydl_opts: Dict, hold: Optional[ExitStack] = None) -> Optional[Dict]:
+        """
+        Return the cache entry for url, downloading it on a miss.
+
+        ydl_opts are the caller's yt_dlp options; 'outtmpl' is replaced so
+        files land in the entry as media.<ext> / media.<lang>.<ext>.
+        With hold, the entry's in_use() lock is entered on it before the
+        entry is returned, so its files stay put until hold is closed;
+        without it they may be evicted at any time (see using()).
+        A URL fetched before is served without asking yt_dlp again.
+        """
+        variant = {k: ydl_opts.get(k) for k in VARIANT_OPTIONS}
+        alias_path = self.url_alias_path(url, variant)
+        try:
+            key = alias_path.read_text(encoding='utf-8').strip()
+        except OSError:
+            key = None
+        if key and (self.entry_dir(key) / META_FILE).exists():
+            with self.locked(key):
+                entry = self.lookup(key)
+                if entry:
+                    if hold is not None:
+                        hold.enter_context(self.in_use(key))
+                    logger.info(f"Download cache hit for {entry.get('id', key)}")
+                    return entry
+
+        import yt_dlp
+
+        probe_opts = {k: v for k, v in ydl_opts.items() if k != 'outtmpl'}
+        with span("probe"), yt_dlp.YoutubeDL(probe_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+
+        key = self.make_key(info.get('extractor_key', 'generic'), info['id'], variant)
+        tmp_path = alias_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(key, encoding='utf-8')
+        os.replace(tmp_path, alias_path)
+
+        with self.locked(key):
+            entry = self.lookup(key)
+            if entry:
+                if hold is not None:
+                    hold.enter_context(self.in_use(key))
+                logger.info(f"Download cache hit for {info['id']}")
+                return entry
+
+            logger.info(f"Download cache miss for {info['id']}, downloading...")
+            staging_dir = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.root))
+            try:
+                opts = dict(ydl_opts, outtmpl=str(staging_dir / 'media.%(ext)s'))
+                with span("download"), yt_dlp.YoutubeDL(opts) as ydl:
+                    result = ydl.process_ie_result(info, download=True)
+                    video_file = Path(ydl.prepare_filename(result)).name
+                download_bytes.inc(sum(p.stat().st_size for p in staging_dir.iterdir() if p.is_file()))
+
+                subtitles = {}
+                for path in staging_dir.glob('media.*.*'):
+                    parts = path.name.split('.')
+                    if len(parts) == 3 and parts[2] in ('srt', 'vtt'):
+                        subtitles[parts[1]] = path.name
+
+                meta = {
+                    'id': info['id'],
+                    'extractor': info.get('extractor_key'),
+                    'title': info.get('title'),
+                    'duration': info.get('duration'),
+                    'ext': result.get('ext'),
+                    'video': video_file if (staging_dir / video_file).exists() else None,
+                    'subtitles': subtitles,
+                }
+                entry = self.store(key, staging_dir, meta)
+                if hold is not None:
+                    hold.enter_context(self.in_use(key))
+                return entry
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _meta_paths(self):
+        # Hidden directories are locks and in-progress downloads
+        return (p for p in self.root.glob(f"*/{META_FILE}") if not p.parent.name.startswith('.'))
+
+    def _resolve(self, key: str, meta: Dict) -> Dict:
+        entry = dict(meta)
+        base = self.entry_dir(key)
+        entry['key'] = key
+        entry['video_path'] = base / meta['video'] if meta.get('video') else None
+        entry['subtitle_paths'] = {lang: base / name for lang, name in meta.get('subtitles', {}).items()}
+        return entry
+
+    def _write_meta(self, key: str, meta: Dict):
+        meta_path = self.entry_dir(key) / META_FILE
+        tmp_path = meta_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+        if name in ('hits', 'misses'):
+            download_cache_requests.inc(result=name)
+
+
+_default_cache: Optional[DownloadCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_download_cache() -> DownloadCache:
+    """Process-wide cache configured by DOWNLOAD_CACHE_DIR/DOWNLOAD_CACHE_MAX_BYTES."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DownloadCache(
+                os.getenv('DOWNLOAD_CACHE_DIR', 'download_cache'),
+                int(os.getenv('DOWNLOAD_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+        return _default_cache
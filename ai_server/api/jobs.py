@@ -0,0 +1,176 @@
+"""Background job queue for long-running summarization requests."""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from telemetry import current_trace_id, in_context, jobs_finished
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """State of one submitted job, updated by the worker running it."""
+
+    def __init__(self, kind: str, key: Hashable, on_change: Optional[Callable[[Dict], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        # Trace of the request that submitted the job; its logs carry the same ID
+        self.trace_id = current_trace_id()
+        self.created = time.time()
+        self.updated = self.created
+        # Called with to_dict() after every state change, e.g. to persist it
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        # Notified on every state change, for wait()
+        self._changes = threading.Condition()
+
+    def report(self, stage: str, progress: Optional[float] = None):
+        """Record the current stage and, optionally, overall progress (0-1)."""
+        with self._lock:
+            self.stage = stage
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, progress))
+            self.updated = time.time()
+        self._changed()
+
+    def publish(self, result: Any):
+        """Expose a partial result (e.g. a stream URL) while the job is still running."""
+        with self._lock:
+            self.result = result
+            self.updated = time.time()
+        self._changed()
+
+    def start(self):
+        with self._lock:
+            self.status = self.stage = RUNNING
+            self.updated = time.time()
+        self._changed()
+
+    def finish(self, status: str, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.stage = status
+            self.result = result
+            self.error = error
+            if status == DONE:
+                self.progress = 1.0
+            self.updated = time.time()
+        self._changed()
+
+    def wait(self, predicate: Callable[['Job'], bool], timeout: Optional[float] = None) -> bool:
+        """
+        Block until predicate(job) holds or the job finishes.
+
+        Returns False if timeout seconds pass first.
+        """
+        with self._changes:
+            return self._changes.wait_for(lambda: self.finished or predicate(self), timeout)
+
+    def _changed(self):
+        with self._changes:
+            self._changes.notify_all()
+        if self.on_change:
+            try:
+                self.on_change(self.to_dict())
+            except Exception as e:
+                logger.warning(f"Could not record state of job {self.id}: {str(e)}")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': round(self.progress, 3),
+                'result': self.result,
+                'error': self.error,
+                'trace_id': self.trace_id,
+                'created': self.created,
+                'updated': self.updated,
+            }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool.
+
+    Jobs submitted with the same key while an earlier one is still queued or
+    running are merged into that job. Finished jobs are kept for ttl seconds.
+    on_change, if given, receives every job's state as it changes (so other
+    processes can report on jobs this one runs).
+    """
+
+    def __init__(self, max_workers: int = 2, ttl: float = 3600,
+                 on_change: Optional[Callable[[Dict], None]] = None):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                       thread_name_prefix="job")
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+        self.in_flight: Dict[Hashable, Job] = {}
+        self.on_change = on_change
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """
+        Queue fn(job, *args, **kwargs) unless an identical job is in flight.
+
+        fn should return the job result (JSON serializable) or raise.
+        """
+        with self._lock:
+            self._prune()
+            existing = self.in_flight.get((kind, key))
+            if existing is not None:
+                logger.info(f"Merged duplicate {kind} request into job {existing.id}")
+                return existing
+
+            job = Job(kind, key, self.on_change)
+            self.jobs[job.id] = job
+            self.in_flight[(kind, key)] = job
+        job._changed()
+
+        self.pool.submit(in_context(self._run), job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        job.start()
+        try:
+            result = fn(job, *args, **kwargs)
+            job.finish(DONE, result=result)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job.finish(FAILED, error=str(e))
+        finally:
+            jobs_finished.inc(kind=job.kind, status=job.status)
+            with self._lock:
+                if self.in_flight.get((job.kind, job.key)) is job:
+                    del self.in_flight[(job.kind, job.key)]
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished and job.updated < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
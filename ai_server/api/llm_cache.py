@@ -0,0 +1,191 @@
+"""Persistent SQLite cache for LLM completions."""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from telemetry import llm_cache_requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+class LLMCache:
+    """
+    Completion cache keyed by a hash of (model, prompt, input text).
+
+    Entries expire after ttl seconds; when the stored text exceeds max_bytes
+    the least recently used entries are dropped. Safe to share between
+    threads and processes (each call opens its own connection).
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite3", ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+
+    @staticmethod
+    def make_key(model: str, prompt: str, content: str, options: Optional[Dict] = None) -> str:
+        """Key of a completion; options are generation settings such as max_tokens."""
+        parts = [model, prompt, content] + ([options] if options else [])
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self._count('misses')
+                return None
+            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return row[0]
+
+    def put(self, key: str, kind: str, model: str, value: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, value, len(value.encode('utf-8')), now, now))
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over max_bytes."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            excess = total - self.max_bytes
+            doomed = []
+            for key, size in conn.execute(
+                    "SELECT key, size FROM completions ORDER BY last_access"):
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            conn.executemany("DELETE FROM completions WHERE key = ?", doomed)
+            logger.info(f"Evicted {len(doomed)} entries from LLM cache")
+
+    def cached(self, kind: str, model: str, prompt: str, content: str,
+               generate: Callable[[], str], bypass: bool = False,
+               options: Optional[Dict] = None) -> str:
+        """
+        Return the cached completion or call generate() and store its result.
+
+        With bypass the cache is not read, but the fresh result replaces the
+        stored one. options must list the settings generate() uses that
+        change its output.
+        """
+        key = self.make_key(model, prompt, content, options)
+        if bypass:
+            self._count('bypassed')
+            llm_cache_requests.inc(kind=kind, result='bypass')
+        else:
+            value = self.get(key)
+            llm_cache_requests.inc(kind=kind, result='miss' if value is None else 'hit')
+            if value is not None:
+                return value
+
+        value = generate()
+        self.put(key, kind, model, value)
+        return value
+
+    def cached_stream(self, kind: str, model: str, prompt: str, content: str,
+                      stream: Callable[[], Iterator[str]], bypass: bool = False,
+                      options: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Streaming variant of cached(): yields chunks as they arrive.
+
+        A cache hit yields the stored text as one chunk. The joined text is
+        stored only if the stream finishes without error.
+        """
+        key = self.make_key(model, prompt, content, options)
+        if bypass:
+            self._count('bypassed')
+            llm_cache_requests.inc(kind=kind, result='bypass')
+        else:
+            value = self.get(key)
+            llm_cache_requests.inc(kind=kind, result='miss' if value is None else 'hit')
+            if value is not None:
+                yield value
+                return
+
+        parts = []
+        for chunk in stream():
+            parts.append(chunk)
+            yield chunk
+        self.put(key, kind, model, ''.join(parts))
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide cache configured by LLM_CACHE_PATH/LLM_CACHE_TTL/LLM_CACHE_MAX_BYTES."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3'),
+                float(os.getenv('LLM_CACHE_TTL', DEFAULT_TTL)),
+                int(os.getenv('LLM_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+        return _default_cache
@@ -2,41 +2,91 @@ from __future__ import unicode_literals
 from flask import send_from_directory
 # Make sure to import your VideoSummarizer class
 
-from flask import Flask, request, jsonify
-import nltk
+from flask import Flask, Request, Response, g, request, jsonify, stream_with_context
 import argparse
 import subprocess
 import sys
+import threading
+import time
+from contextlib import ExitStack
 from datetime import datetime
 from typing import Tuple, List, Optional, Dict
 from pathlib import Path
 import logging
-import yt_dlp
-import chardet
-import pysrt
-from moviepy.editor import VideoFileClip, concatenate_videoclips
-from collections import defaultdict
-import numpy as np
-from nltk.tokenize import sent_tokenize
-from nltk.tag import pos_tag
+import mimetypes
+import re
 from flask_cors import CORS
 import os
 import tempfile
-import yt_dlp  # Use yt_dlp instead of youtube_dl
-from moviepy.editor import VideoFileClip
-import google.generativeai as genai
-import openai
-from pydub import AudioSegment
+# moviepy, yt_dlp, pydub, openai and google.generativeai are imported
+# lazily where they are used to keep server startup fast
 from dotenv import load_dotenv
-from app import VideoSummarizer
+from app import (VideoSummarizer, check_external_dependencies, open_subtitles,
+                 subtitle_lines, warm_up_nltk)
+from batch import run_batch
+from download_cache import get_download_cache
+from transcribe import transcribe_audio_segments
+from jobs import DONE, FAILED, JobManager
+from llm_cache import get_llm_cache
+from mapreduce import map_reduce_summarize, prepare_reduce_input
+from providers import get_provider, provider_stats
+from retrieval import format_timestamp, get_index_store, group_segments
+from scorers import SCORERS
+from sessions import DEFAULT_SESSION, SESSION_ID_RE, get_session_store
+from streaming import sse_event, stream_events
+from uploads import UploadOffsetError, get_upload_store
+from telemetry import (CONTENT_TYPE as METRICS_CONTENT_TYPE, current_trace_id, end_trace,
+                       http_request_seconds, render_metrics, span, start_trace, traced)
 # Load environment variables from .env file
 load_dotenv()
 
+
+
+class UploadRequest(Request):
+    """Spool multipart file uploads into the upload store, hashing them as they arrive."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return get_upload_store().open_writer()
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)
-app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_DIR', 'uploads')
+# Encoder processes and threads for the 'parallel' render mode
+app.config['RENDER_WORKERS'] = int(os.getenv('RENDER_WORKERS', '0')) or None
+app.config['RENDER_THREADS'] = int(os.getenv('RENDER_THREADS', '0')) or None
+# Let a fronting nginx/Apache send output files (X-Sendfile) instead of Python
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '0') == '1'
+# Finished outputs have unique names and never change
+app.config['OUTPUT_MAX_AGE'] = int(os.getenv('OUTPUT_MAX_AGE', str(365 * 24 * 3600)))
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+# Concurrent Whisper requests per transcription
+app.config['TRANSCRIBE_WORKERS'] = int(os.getenv('TRANSCRIBE_WORKERS', '8'))
+# Videos of one /summarize_batch job downloaded and rendered at a time
+app.config['BATCH_JOBS'] = int(os.getenv('BATCH_JOBS', '2'))
+app.config['BATCH_MAX_URLS'] = int(os.getenv('BATCH_MAX_URLS', '500'))
+# Background workers for async=true requests
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
+# Seconds a preview=true request waits for its preview before answering with just the job
+app.config['PREVIEW_TIMEOUT'] = float(os.getenv('PREVIEW_TIMEOUT', '300'))
+# Job state is mirrored to the session store so any worker process can answer /jobs/<id>
+jobs = JobManager(max_workers=app.config['JOB_WORKERS'], on_change=get_session_store().save_job)
+# Long transcripts are summarized in chunks of about this many tokens,
+# SUMMARY_MAP_WORKERS chunks at a time, before a final reduce pass
+app.config['SUMMARY_CHUNK_TOKENS'] = int(os.getenv('SUMMARY_CHUNK_TOKENS', '6000'))
+app.config['SUMMARY_MAP_WORKERS'] = int(os.getenv('SUMMARY_MAP_WORKERS', '4'))
+# Transcript segments retrieved as context for each /chat question (at least one)
+app.config['CHAT_TOP_K'] = max(1, int(os.getenv('CHAT_TOP_K', '5')))
+# Length limit of /chat answers, streamed or not
+app.config['CHAT_MAX_TOKENS'] = int(os.getenv('CHAT_MAX_TOKENS', '150'))
 ALLOWED_EXTENSIONS = {'mp4'}
-summary_chat = ""
+# Uploaded files are summarized as the source "upload:<sha256 of the file>"
+UPLOAD_PREFIX = 'upload:'
+# Requests may only pick a subdirectory of output/ by name
+OUTPUT_ROOT = 'output'
+OUTPUT_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
 # Ensure the upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -45,13 +95,35 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# Retrieve API keys from environment variables
-genai_api_key = os.getenv("GENAI_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
+def resolve_output_dir(name):
+    """The directory under output/ for a request's output_dir, or None if the name is not allowed."""
+    if not name or name == OUTPUT_ROOT:
+        return OUTPUT_ROOT
+    if not isinstance(name, str) or not OUTPUT_NAME_RE.match(name):
+        return None
+    return f"{OUTPUT_ROOT}/{name}"
+
+
+def current_session_id(data=None):
+    """
+    The caller's session: the X-Session-ID header or a session_id field.
+
+    Clients that send neither share the default session; a malformed ID
+    gives None rather than falling back to it.
+    """
+    session_id = request.headers.get('X-Session-ID')
+    if session_id is None:
+        session_id = (data or {}).get('session_id')
+    if session_id is None:
+        return DEFAULT_SESSION
+    if isinstance(session_id, str) and SESSION_ID_RE.match(session_id):
+        return session_id
+    return None
+
+
+# Gemini and OpenAI clients are created on first use by providers.get_provider,
+# which reads GENAI_API_KEY and OPENAI_API_KEY from the environment
 
-# Configure the APIs with hardcoded keys
-genai.configure(api_key=genai_api_key)
-openai.api_key = openai_api_key
 
 summary_prompt = """You are a YouTube video summarizer. You will be taking the transcript text
 and summarizing the entire video and providing the important summary in points
@@ -60,76 +132,249 @@ within 100 words. Please provide the summary of the text given here:  """
 chat_prompt = """You are a helpful AI assistant. Based on the context provided, answer the user's question accurately and concisely: """
 
 
-def download_video_srt(url):
-    """Downloads specified YouTube video's subtitles as a vtt/srt file and the video itself."""
-    outtmpl = os.path.join(os.getcwd(), 'downloads',
-                           '%(title)s-%(id)s.%(ext)s')
-    # Create downloads directory if it doesn't exist
-    os.makedirs(os.path.dirname(outtmpl), exist_ok=True)
+def download_video_srt(url, hold=None):
+    """
+    Downloads specified YouTube video's subtitles as a vtt/srt file and the video itself.
 
+    The files stay in the download cache until hold (an ExitStack) is closed.
+    """
     ydl_opts = {
         'format': 'best',
-        'outtmpl': outtmpl,
         'subtitlesformat': 'srt',
         'writeautomaticsub': True,
     }
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(url, download=True)
-        movie_filename = ydl.prepare_filename(result)
-        subtitle_info = result.get("requested_subtitles", {})
+    # Files are shared through the download cache instead of downloads/
+    entry = get_download_cache().fetch(url, ydl_opts, hold)
+    movie_filename = str(entry['video_path']) if entry['video_path'] else None
 
-        # Get the first available subtitle
-        if subtitle_info:
-            subtitle_language = next(iter(subtitle_info.keys()))
-            subtitle_ext = subtitle_info[subtitle_language]['ext']
-            subtitle_filename = movie_filename.replace(
-                ".mp4", f".{subtitle_language}.{subtitle_ext}")
-        else:
-            subtitle_filename = None
+    # Get the first available subtitle
+    if entry['subtitle_paths']:
+        subtitle_filename = str(next(iter(entry['subtitle_paths'].values())))
+    else:
+        subtitle_filename = None
 
     return movie_filename, subtitle_filename
 
 
+def download_captions(url, hold=None):
+    """Downloads only the video's subtitles; returns the subtitle path or None."""
+    ydl_opts = {
+        'skip_download': True,
+        'subtitlesformat': 'srt',
+        'writeautomaticsub': True,
+    }
+
+    entry = get_download_cache().fetch(url, ydl_opts, hold)
+    if entry['subtitle_paths']:
+        return str(next(iter(entry['subtitle_paths'].values())))
+    return None
+
+
+def download_audio(url, hold=None):
+    """Downloads only the video's audio track; returns its path or None."""
+    entry = get_download_cache().fetch(url, {'format': 'bestaudio/best'}, hold)
+    return str(entry['video_path']) if entry['video_path'] else None
+
+
+def resolve_transcript_segments(url):
+    """Return ([(start, end, text)], source), using captions when the video has them.
+
+    Whisper transcription of the audio track is only the fallback, and the
+    only option for uploaded files.
+    """
+    if url.startswith(UPLOAD_PREFIX):
+        upload = get_upload_store().get(url[len(UPLOAD_PREFIX):])
+        if upload is None:
+            return None, None
+        with span("whisper"):
+            return extract_transcript_segments(str(upload['path'])), 'whisper'
+
+    # Cached files read below must not be evicted until they are parsed/transcribed
+    with span("captions"), ExitStack() as hold:
+        subtitle_file = download_captions(url, hold)
+        if subtitle_file and os.path.isfile(subtitle_file):
+            try:
+                segments = group_segments(subtitle_lines(open_subtitles(Path(subtitle_file))))
+            except Exception as e:
+                logger.warning(f"Could not parse captions {subtitle_file}: {str(e)}")
+                segments = None
+            if segments:
+                return segments, 'captions'
+
+    with span("whisper"), ExitStack() as hold:
+        audio_file = download_audio(url, hold)
+        if audio_file and os.path.isfile(audio_file):
+            return extract_transcript_segments(audio_file), 'whisper'
+    return None, None
+
+
+def resolve_transcript(url):
+    """Return (transcript_text, source) and make sure the video is indexed for /chat."""
+    store = get_index_store()
+    if url.startswith(UPLOAD_PREFIX):
+        # Uploads are keyed by content, so an indexed one needs no transcription
+        index = store.get(url)
+        if index is not None:
+            return ' '.join(text for _, _, text in index.segments()), 'cache'
+
+    segments, source = resolve_transcript_segments(url)
+    if not segments:
+        return None, None
+
+    if store.get(url) is None:
+        store.put(url, segments)
+    return ' '.join(text for _, _, text in segments), source
+
+
+def extract_transcript_segments(video_file):
+    """Transcribe a video's audio with OpenAI Whisper into timestamped segments."""
+    try:
+        from pydub import AudioSegment
+
+        # Decode the audio track straight from the video, no temp WAV
+        audio = AudioSegment.from_file(video_file)
+        return transcribe_audio_segments(audio, max_workers=app.config['TRANSCRIBE_WORKERS'])
+
+    except Exception as e:
+        print("Error extracting transcript from video:", e)
+        return None
+
+
 def extract_transcript_from_video(video_file):
     """Extract audio from video and transcribe it using OpenAI Whisper."""
-    try:
-        video = VideoFileClip(video_file)
-        audio_path = os.path.join(tempfile.gettempdir(), "temp_audio.wav")
-        video.audio.write_audiofile(audio_path)
+    segments = extract_transcript_segments(video_file)
+    if segments is None:
+        return None
+    return ' '.join(text for _, _, text in segments)
+
+
+def generate_gemini_content(transcript_text, prompt, refresh=False):
+    """Generate summary using Google Gemini Pro.
+
+    Results are cached by model, prompt and transcript; refresh forces a new call.
+    """
+    def generate():
+        return get_provider('gemini').complete(prompt + transcript_text, "gemini-pro")
 
-        audio = AudioSegment.from_wav(audio_path)
-        chunk_length_ms = 25 * 1000  # 25 seconds
-        chunks = [audio[i:i + chunk_length_ms]
-                  for i in range(0, len(audio), chunk_length_ms)]
+    return get_llm_cache().cached('summary', 'gemini-pro', prompt, transcript_text,
+                                  generate, bypass=refresh)
 
-        transcript = ""
 
-        # Transcribe each chunk
-        for i, chunk in enumerate(chunks):
-            chunk_path = os.path.join(
-                tempfile.gettempdir(), f"temp_chunk_{i}.wav")
-            chunk.export(chunk_path, format="wav")
+def prepare_summary_input(transcript_text, refresh=False):
+    """Condense a long transcript into chunk summaries that fit one prompt."""
+    return prepare_reduce_input(
+        transcript_text,
+        lambda text, prompt: generate_gemini_content(text, prompt, refresh),
+        max_tokens=app.config['SUMMARY_CHUNK_TOKENS'],
+        max_workers=app.config['SUMMARY_MAP_WORKERS'])
 
-            with open(chunk_path, 'rb') as audio_file:
-                transcript_response = openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=audio_file
-                )
-                transcript += transcript_response['text'] + " "
 
-        return transcript.strip()
+@traced("llm_summary")
+def summarize_transcript(transcript_text, prompt, refresh=False):
+    """Summarize a transcript of any length; long ones go through map-reduce."""
+    return map_reduce_summarize(
+        transcript_text,
+        lambda text, chunk_prompt: generate_gemini_content(text, chunk_prompt, refresh),
+        prompt,
+        max_tokens=app.config['SUMMARY_CHUNK_TOKENS'],
+        max_workers=app.config['SUMMARY_MAP_WORKERS'])
 
+
+def stream_transcript_summary(youtube_url, language, refresh=False, session_id=DEFAULT_SESSION):
+    """Yield SSE events for /summarize: a status event, summary tokens, then 'done'."""
+    modified_summary_prompt = f"{summary_prompt} Please summarize the text in {language}."
+
+    # Send something straight away; resolving the transcript can take a while
+    yield sse_event({'stage': 'transcript'}, 'status')
+    try:
+        transcript_text, transcript_source = resolve_transcript(youtube_url)
     except Exception as e:
-        print("Error extracting transcript from video:", e)
-        return None
+        logger.error(f"Error resolving transcript for {youtube_url}: {str(e)}")
+        yield sse_event({'error': str(e)}, 'error')
+        return
+    if not transcript_text:
+        yield sse_event({'error': "Could not retrieve transcript from the video."}, 'error')
+        return
+    yield sse_event({'stage': 'summarizing', 'transcript_source': transcript_source}, 'status')
+
+    parts = []
+
+    def tokens():
+        # Chunk summaries of a long transcript are not streamed; only the
+        # final pass in the requested language is
+        summary_input = prepare_summary_input(transcript_text, refresh)
+        chunks = get_llm_cache().cached_stream(
+            'summary', 'gemini-pro', modified_summary_prompt, summary_input,
+            lambda: get_provider('gemini').stream(modified_summary_prompt + summary_input, "gemini-pro"),
+            bypass=refresh)
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+        save_summary(''.join(parts), youtube_url, session_id)
+
+    yield from stream_events(tokens())
+
+
+def save_summary(summary, video_url=None, session_id=DEFAULT_SESSION):
+    """Store the session's summary for /chat, remembering which video it belongs to."""
+    get_session_store().save_summary(session_id, summary, video_url)
+
+
+def sse_response(events):
+    """Wrap an SSE generator in an unbuffered streaming response."""
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@traced("transcript_summary")
+def run_transcript_summary(job, youtube_url, language, refresh=False, session_id=DEFAULT_SESSION):
+    """Summarize a video's transcript; returns the response payload or raises."""
+    report = job.report if job else (lambda stage, progress=None: None)
+    modified_summary_prompt = f"{summary_prompt} Please summarize the text in {language}."
+
+    report('transcript', 0.1)
+    transcript_text, transcript_source = resolve_transcript(youtube_url)
+    if not transcript_text:
+        raise RuntimeError("Could not retrieve transcript from the video.")
+
+    report('summarizing', 0.7)
+    summary = summarize_transcript(
+        transcript_text, modified_summary_prompt, refresh)
+
+    save_summary(summary, youtube_url, session_id)
+
+    return {"success": True, "summary": summary, "transcript_source": transcript_source}
+
+
+@app.before_request
+def begin_trace():
+    """Every request gets a trace ID (X-Request-ID if the caller sent one)."""
+    g.trace_token = start_trace(request.headers.get('X-Request-ID'))
+    g.request_start = time.perf_counter()
+
 
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_request_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint,
+                                 method=request.method, status=response.status_code)
+    response.headers['X-Trace-Id'] = current_trace_id()
+    return response
 
-def generate_gemini_content(transcript_text, prompt):
-    """Generate summary using Google Gemini Pro."""
-    model = genai.GenerativeModel("gemini-pro")
-    response = model.generate_content(prompt + transcript_text)
-    return response.text
+
+@app.teardown_request
+def finish_trace(exc=None):
+    # Streamed responses tear down twice (again when stream_with_context finishes)
+    if 'trace_token' in g:
+        end_trace(g.pop('trace_token'))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this process."""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
 
 
 @app.route('/', methods=['GET'])
@@ -137,10 +382,10 @@ def health_check():
     return jsonify({"message": "Backend AI is running."})
 
 
-# Configure logging
+# Configure logging (app.py installs the trace_id log record attribute)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(levelname)s - trace=%(trace_id)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout),
         logging.FileHandler('video_summarizer.log')
@@ -148,6 +393,77 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_summarizers: Dict[str, VideoSummarizer] = {}
+_summarizers_lock = threading.Lock()
+
+
+def get_summarizer(output_dir='output'):
+    """Return the shared summarizer for output_dir, creating it on first use."""
+    with _summarizers_lock:
+        if output_dir not in _summarizers:
+            _summarizers[output_dir] = VideoSummarizer(
+                output_dir=output_dir,
+                render_workers=app.config['RENDER_WORKERS'],
+                render_threads=app.config['RENDER_THREADS'])
+        return _summarizers[output_dir]
+
+
+def warm_up():
+    """One-time boot work: NLTK data and models, ffmpeg check, default summarizer."""
+    start = time.perf_counter()
+    try:
+        warm_up_nltk()
+    except Exception as e:
+        logger.error(f"Failed to load NLTK resources: {str(e)}")
+    if not check_external_dependencies():
+        logger.warning("ffmpeg is missing; video endpoints will fail")
+    get_summarizer()
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+
+# Set WARM_UP=0 to skip (e.g. for import-time benchmarks)
+if os.getenv('WARM_UP', '1') != '0':
+    warm_up()
+
+
+def run_video_summary(job, url, duration, output_dir, render_mode, frame_accurate, range_download,
+                      preview=False, scorer=None):
+    """
+    Create a summary video; returns the response payload or raises.
+
+    With preview, a low-resolution preview is published (preview_url) as
+    soon as it is rendered; the final payload keeps it next to the
+    full-quality path.
+    """
+    summarizer = get_summarizer(output_dir)
+    stream = {}
+
+    def on_output(playlist_path):
+        # Assuming your app is served at http://localhost:5000, adjust as necessary
+        relative = playlist_path.relative_to(summarizer.output_dir).as_posix()
+        stream['stream_url'] = f"http://localhost:5000/{output_dir}/{relative}"
+        if job:
+            job.publish(dict(stream, message='Summary video is rendering; playback can start'))
+
+    def on_preview(preview_path):
+        # Assuming your app is served at http://localhost:5000, adjust as necessary
+        stream['preview_url'] = f"http://localhost:5000/{output_dir}/{preview_path.name}"
+        if job:
+            job.publish(dict(stream, message='Preview is ready; the full-quality video is rendering'))
+
+    result_path = summarizer.process_video(
+        url, duration, render_mode, frame_accurate, range_download,
+        progress=job.report if job else None, on_output=on_output,
+        on_preview=on_preview if preview else None, scorer=scorer)
+    print(result_path)
+
+    if not result_path:
+        raise RuntimeError('Failed to create summary video. Check the logs for details.')
+
+    # Assuming your app is served at http://localhost:5000, adjust as necessary
+    video_url = f"http://localhost:5000/{output_dir}/{result_path.name}"
+    return dict(stream, message='Summary video created successfully', path=video_url)
+
 
 @app.route('/summarize_video', methods=['POST'])
 def summarize_video():
@@ -160,86 +476,278 @@ def summarize_video():
     print(data)
     print(type(duration))
     duration = data.get('duration', duration)  # Default duration is 60 seconds
-    output_dir = data.get('output_dir', 'output')  # Default output directory
+    output_dir = resolve_output_dir(data.get('output_dir'))  # Default output directory
+    render_mode = data.get('render_mode', 'reencode')  # or 'fast_cut'/'parallel'/'hls'
+    frame_accurate = bool(data.get('frame_accurate', False))
+    range_download = bool(data.get('range_download', False))
+    preview = bool(data.get('preview', False))
+    scorer = data.get('scorer')  # 'heuristic' (default), 'tfidf' or 'textrank'
 
     # Validate URL input
     if not url:
         return jsonify({'error': 'YouTube video URL is required'}), 400
+    if output_dir is None:
+        return jsonify({'error': 'output_dir must be a plain directory name'}), 400
+    if scorer is not None and (not isinstance(scorer, str) or scorer not in SCORERS):
+        return jsonify({'error': f"scorer must be one of {', '.join(sorted(SCORERS))}"}), 400
+
+    params = (url, duration, output_dir, render_mode, frame_accurate, range_download, preview, scorer)
+    if data.get('async'):
+        job = jobs.submit('summarize_video', params, run_video_summary, *params)
+        return jsonify({'job_id': job.id, 'status_url': f"/jobs/{job.id}"}), 202
+
+    if preview:
+        # Answer with the preview; the full render carries on as a job
+        job = jobs.submit('summarize_video', params, run_video_summary, *params)
+        job.wait(lambda running: 'preview_url' in (running.result or {}), app.config['PREVIEW_TIMEOUT'])
+        state = job.to_dict()
+        if state['status'] == FAILED:
+            return jsonify({'error': state['error'], 'job_id': job.id}), 500
+        payload = dict(state['result'] or {}, job_id=job.id, status_url=f"/jobs/{job.id}")
+        return jsonify(payload), 200 if state['status'] == DONE else 202
 
-    # Create a summarizer instance and process the video
-    summarizer = VideoSummarizer(output_dir=output_dir)
-    result_path = summarizer.process_video(url, duration)
-    print(result_path)
-
-    if result_path:
-        # Assuming your app is served at http://localhost:5000, adjust as necessary
-        video_url = f"http://localhost:5000/{output_dir}/{result_path.name}"
-
-        return jsonify({'message': 'Summary video created successfully', 'path': video_url}), 200
-    else:
-        return jsonify({'error': 'Failed to create summary video. Check the logs for details.'}), 500
+    try:
+        return jsonify(run_video_summary(None, *params)), 200
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def run_video_batch(job, urls, duration, output_dir, render_mode, frame_accurate, range_download,
+                    scorer=None):
+    """Summarize a list of videos/playlists; finished items are published as they complete."""
+    summarizer = get_summarizer(output_dir)
+    items = []
+
+    def item_payload(result):
+        payload = dict(result)
+        if result['path']:
+            # Assuming your app is served at http://localhost:5000, adjust as necessary
+            payload['path'] = f"http://localhost:5000/{output_dir}/{Path(result['path']).name}"
+        return payload
+
+    def on_item(result):
+        items.append(item_payload(result))
+        job.publish({'items': list(items)})
+
+    results = run_batch(summarizer, urls, duration, render_mode, frame_accurate, range_download,
+                        jobs=app.config['BATCH_JOBS'], progress=job.report, on_item=on_item,
+                        scorer=scorer)
+    payloads = [item_payload(result) for result in results]
+    done = sum(1 for payload in payloads if payload['status'] == 'done')
+    return {'message': f"{done} of {len(payloads)} summary videos created", 'items': payloads}
+
+
+@app.route('/summarize_batch', methods=['POST'])
+def summarize_batch():
+    """
+    Summarize many videos as one background job.
+
+    Takes 'urls' (videos or playlists) plus the /summarize_video options.
+    Resubmitting the same batch skips videos that were already rendered.
+    """
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+        return jsonify({'error': 'A list of video or playlist URLs is required'}), 400
+    if len(urls) > app.config['BATCH_MAX_URLS']:
+        return jsonify({'error': f"At most {app.config['BATCH_MAX_URLS']} URLs per batch"}), 400
+    output_dir = resolve_output_dir(data.get('output_dir'))
+    if output_dir is None:
+        return jsonify({'error': 'output_dir must be a plain directory name'}), 400
+    scorer = data.get('scorer')
+    if scorer is not None and (not isinstance(scorer, str) or scorer not in SCORERS):
+        return jsonify({'error': f"scorer must be one of {', '.join(sorted(SCORERS))}"}), 400
+
+    params = (tuple(urls), int(data.get('duration', data.get('length', 60))),
+              output_dir, data.get('render_mode', 'reencode'),
+              bool(data.get('frame_accurate', False)), bool(data.get('range_download', False)),
+              scorer)
+    job = jobs.submit('summarize_batch', params, run_video_batch, *params)
+    return jsonify({'job_id': job.id, 'status_url': f"/jobs/{job.id}"}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is not None:
+        return jsonify(job.to_dict())
+    # Submitted to another worker process
+    state = get_session_store().get_job(job_id)
+    if state is None:
+        return jsonify({'error': 'Unknown job ID'}), 404
+    return jsonify(state)
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'downloads': get_download_cache().stats(),
+                    'llm': get_llm_cache().stats()})
+
+
+@app.route('/providers/stats', methods=['GET'])
+def providers_stats():
+    """Calls, retries, hedges and rate-limit waits per LLM/ASR provider."""
+    return jsonify(provider_stats())
 
 
 @app.route('/output/<path:filename>')
 def serve_file(filename):
-    return send_from_directory('output', filename)
+    """
+    Serve output files with Range, ETag and Last-Modified support.
+
+    Finished videos and HLS segments never change, so clients and proxies may
+    cache them for good; playlists can still grow while rendering and must
+    be revalidated.
+    """
+    growing = filename.endswith('.m3u8')
+    # max_age=None makes the response no-cache
+    response = send_from_directory(OUTPUT_ROOT, filename, conditional=True, etag=True,
+                                   max_age=None if growing else app.config['OUTPUT_MAX_AGE'])
+    response.headers['Accept-Ranges'] = 'bytes'
+    if not growing:
+        response.cache_control.immutable = True
+    return response
+
+
+def is_true(value):
+    """Flag from JSON (true/1) or form data ('true'/'1'/'on')."""
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def upload_payload(status):
+    """Response body for a chunked upload, finished or not."""
+    if status.get('complete'):
+        return {"success": True, "complete": True, "upload": status['sha256'],
+                "size": status['size'], "duplicate": status['duplicate']}
+    return {"success": True, "complete": False, "upload_id": status['upload_id'],
+            "offset": status['offset'], "size": status['size'],
+            "upload_url": f"/uploads/{status['upload_id']}"}
+
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable upload; the file is then sent with PATCH /uploads/<upload_id>."""
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    if not allowed_file(filename):
+        return jsonify({"success": False, "error": "Unsupported file type. Only .mp4 files are allowed."}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        size = 0
+    if size <= 0:
+        return jsonify({"success": False, "error": "File size in bytes is required"}), 400
+
+    store = get_upload_store()
+    # A client that already knows the file's hash can skip sending a stored file
+    known = store.get(data.get('sha256'))
+    if known is not None:
+        return jsonify(upload_payload(dict(known, complete=True, duplicate=True)))
+
+    status = store.create_upload(filename, size)
+    response = jsonify(upload_payload(status))
+    response.headers['Upload-Offset'] = str(status['offset'])
+    return response, 201
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Bytes received so far; a client resumes a dropped upload from this offset."""
+    status = get_upload_store().upload_status(upload_id)
+    if status is None:
+        return jsonify({"success": False, "error": "Unknown or finished upload"}), 404
+    response = jsonify(upload_payload(status))
+    response.headers['Upload-Offset'] = str(status['offset'])
+    return response
+
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    """
+    Append the request body at the Upload-Offset header's position.
+
+    Chunks are written to disk as they stream in, so a dropped connection
+    keeps everything received up to that point.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({"success": False, "error": "Upload-Offset header is required"}), 400
+
+    try:
+        status = get_upload_store().append(upload_id, offset, request.stream)
+    except UploadOffsetError as e:
+        response = jsonify({"success": False, "error": str(e), "offset": e.offset})
+        response.headers['Upload-Offset'] = str(e.offset)
+        return response, 409
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if status is None:
+        return jsonify({"success": False, "error": "Unknown or finished upload"}), 404
+
+    response = jsonify(upload_payload(status))
+    if not status['complete']:
+        response.headers['Upload-Offset'] = str(status['offset'])
+    return response
 
 
 @app.route('/summarize', methods=['POST'])
 def summarize():
+    upload = None
     if 'file' in request.files:
         file = request.files['file']
+        if not (file and allowed_file(file.filename)):
+            return jsonify({"success": False, "error": "Unsupported file type. Only .mp4 files are allowed."}), 400
 
-        if file and allowed_file(file.filename):
-            # Set the uploads directory
-            upload_folder = app.config['UPLOAD_FOLDER']
-            # Create uploads directory if it doesn't exist
-            os.makedirs(upload_folder, exist_ok=True)
-
-            file_path = os.path.join(upload_folder, file.filename)
-            file.save(file_path)
-            modified_summary_prompt = f"{summary_prompt} Please summarize the text in {language}."
-
-            transcript_text = extract_transcript_from_video(file_path)
-            summary = generate_gemini_content(
-                transcript_text, modified_summary_prompt)
-
-            # Write summary to a text file
-            with open('summary.txt', 'w', encoding='utf-8') as f:
-                f.write(summary)
-
-            return jsonify({"success": True, "summary": summary})
-
-            print("Could not retrieve transcript from the video.")
-            return jsonify({"success": False, "error": "Could not retrieve transcript from the video."}), 400
-
-        return jsonify({"success": False, "error": "Unsupported file type. Only .mp4 files are allowed."}), 400
+        # The file was hashed while it streamed in; a file seen before
+        # reuses its stored copy, transcript index and cached summary
+        upload = get_upload_store().add_stream(file.stream, file.filename)
+        data = request.form
 
     elif request.is_json:
         data = request.get_json()
         print(data)
-        youtube_url = data.get('url')
-        language = data.get('language')
-        print(language)
-        modified_summary_prompt = f"{summary_prompt} Please summarize the text in {language}."
+        if data.get('upload'):
+            # Content hash returned by a finished /uploads upload
+            upload = get_upload_store().get(data['upload'])
+            if upload is None:
+                return jsonify({"success": False, "error": "Unknown upload"}), 404
+
+    else:
+        return jsonify({"success": False, "error": "No file or URL provided"}), 400
 
-        if not youtube_url:
-            return jsonify({"success": False, "error": "No URL provided"}), 400
+    youtube_url = UPLOAD_PREFIX + upload['sha256'] if upload else data.get('url')
+    language = data.get('language') or 'English'
+    print(language)
+    refresh = is_true(data.get('refresh', False))  # Bypass the LLM cache
+    session_id = current_session_id(data)
+    if session_id is None:
+        return jsonify({"success": False, "error": "Invalid session ID"}), 400
+    extra = {"upload": upload['sha256']} if upload else {}
+    extra['session_id'] = session_id
 
-        video_file, subtitle_file = download_video_srt(youtube_url)
+    if not youtube_url:
+        return jsonify({"success": False, "error": "No URL provided"}), 400
 
-        if os.path.isfile(video_file):
-            transcript_text = extract_transcript_from_video(video_file)
-            summary = generate_gemini_content(
-                transcript_text, modified_summary_prompt)
+    if is_true(data.get('stream', False)):
+        return sse_response(stream_transcript_summary(youtube_url, language, refresh, session_id))
 
-            # Write summary to a text file
-            with open('summary.txt', 'w', encoding='utf-8') as f:
-                f.write(summary)
+    if is_true(data.get('async', False)):
+        job = jobs.submit('summarize', (youtube_url, language, refresh, session_id),
+                          run_transcript_summary, youtube_url, language, refresh, session_id)
+        return jsonify(dict(extra, success=True, job_id=job.id, status_url=f"/jobs/{job.id}")), 202
 
-            return jsonify({"success": True, "summary": summary})
+    try:
+        return jsonify(dict(run_transcript_summary(None, youtube_url, language, refresh, session_id),
+                            **extra))
+    except RuntimeError as e:
+        return jsonify(dict(extra, success=False, error=str(e))), 400
 
-    return jsonify({"success": False, "error": "No file or URL provided"}), 400
+
+def chat_events(chunks, sources):
+    """A 'sources' event with the retrieved segments, then the answer tokens."""
+    yield sse_event({'sources': sources}, 'sources')
+    yield from stream_events(chunks)
 
 
 @app.route('/chat', methods=['POST'])
@@ -250,32 +758,65 @@ def chat():
         data['messages']) if message['role'] == 'user'), None)
     print(data)
 
-    # Read summary from the text file
-    try:
-        with open('summary.txt', 'r', encoding='utf-8') as f:
-            summary_text = f.read()
-    except FileNotFoundError:
-        return jsonify({"success": False, "error": "Summary not found. Please summarize a video first."}), 400
+    session_id = current_session_id(data)
+    if session_id is None:
+        return jsonify({"success": False, "error": "Invalid session ID"}), 400
+    # The summary this session last created
+    session = get_session_store().get_session(session_id)
+    summary_text = session['summary'] if session else ""
 
-    if not user_input or not summary_text:
+    if not user_input:
         return jsonify({"success": False, "error": "User input and summary text are required."}), 400
 
-    # Combine the chat prompt with the summary and the user input
-    complete_prompt = chat_prompt + "\n\nContext:\n" + \
-        summary_text + "\n\nUser Question:\n" + user_input
+    # Only the transcript segments relevant to the question go in the prompt. Chat
+    # never fetches transcripts itself: only videos indexed by /summarize are searched
+    video_url = data.get('url') or (session['video'] if session else None)
+    sources = []
+    if video_url:
+        index = get_index_store().get(video_url)
+        if index is not None:
+            sources = index.search(user_input, app.config['CHAT_TOP_K'])
+        elif data.get('url'):
+            return jsonify({"success": False, "error": "Video not found. Please summarize it first."}), 404
+
+    if not summary_text and not sources:
+        return jsonify({"success": False, "error": "Summary not found. Please summarize a video first."}), 400
+
+    excerpts = "\n".join(
+        f"[{format_timestamp(source['start'])}-{format_timestamp(source['end'])}] {source['text']}"
+        for source in sorted(sources, key=lambda source: source['start']))
+
+    # Combine the chat prompt with the summary, transcript excerpts and the user input
+    complete_prompt = chat_prompt + "\n\nContext:\n" + summary_text
+    if excerpts:
+        complete_prompt += "\n\nTranscript excerpts:\n" + excerpts
+    complete_prompt += "\n\nUser Question:\n" + user_input
+
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": complete_prompt}
+    ]
+    refresh = bool(data.get('refresh', False))
+    max_tokens = app.config['CHAT_MAX_TOKENS']
+
+    if data.get('stream'):
+        chunks = get_llm_cache().cached_stream(
+            'chat', 'gpt-3.5-turbo', chat_prompt, complete_prompt,
+            lambda: get_provider('openai').chat_stream(messages, "gpt-3.5-turbo", max_tokens=max_tokens),
+            bypass=refresh, options={'max_tokens': max_tokens})
+        return sse_response(chat_events(chunks, sources))
 
     # Use the ChatCompletion API for chat models
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",  # or "gpt-4" if you have access
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": complete_prompt}
-        ],
-        max_tokens=150
-    )
-
-    answer = response['choices'][0]['message']['content'].strip()
-    return jsonify({"success": True, "answer": answer})
+    def generate():
+        return get_provider('openai').chat(
+            messages,
+            "gpt-3.5-turbo",  # or "gpt-4" if you have access
+            max_tokens=max_tokens
+        )
+
+    answer = get_llm_cache().cached('chat', 'gpt-3.5-turbo', chat_prompt, complete_prompt,
+                                    generate, bypass=refresh, options={'max_tokens': max_tokens})
+    return jsonify({"success": True, "answer": answer, "sources": sources})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,114 @@
+"""Map-reduce summarization for transcripts too long for one prompt."""
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from telemetry import in_context, span
+
+logger = logging.getLogger(__name__)
+
+# Rough English average; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Sentence ends: punctuation followed by whitespace
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+chunk_prompt = """You are summarizing one part of a longer video transcript.
+List the key points of this part in concise bullet points, keeping names,
+numbers and conclusions. Transcript part:  """
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in SENTENCE_END_RE.split(text.strip()) if s]
+
+
+def chunk_transcript(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text on sentence boundaries into chunks of at most max_tokens.
+
+    A sentence longer than the budget (unpunctuated captions are one long
+    sentence) is packed word by word instead, and a word longer than the
+    budget is cut into pieces.
+    """
+    # Longest text estimate_tokens() still fits in max_tokens
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN - 1)
+    chunks: List[str] = []
+    current: List[str] = []
+    current_chars = 0
+
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            chunks.append(' '.join(current))
+        current, current_chars = [], 0
+
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            pieces = [sentence]
+        else:
+            pieces = [word[i:i + max_chars] for word in sentence.split()
+                      for i in range(0, len(word), max_chars)]
+        for piece in pieces:
+            # Length of the chunk once joined with a space
+            chars = current_chars + bool(current) + len(piece)
+            if chars > max_chars:
+                flush()
+                chars = len(piece)
+            current.append(piece)
+            current_chars = chars
+    flush()
+    return chunks
+
+
+def map_summaries(chunks: List[str], summarize_fn: Callable[[str, str], str],
+                  prompt: str = chunk_prompt, max_workers: int = 4) -> List[str]:
+    """Summarize chunks concurrently, returning results in chunk order."""
+    with span("map_summaries", chunks=len(chunks)), \
+            ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return list(pool.map(in_context(lambda chunk: summarize_fn(chunk, prompt)), chunks))
+
+
+def prepare_reduce_input(text: str, summarize_fn: Callable[[str, str], str],
+                         max_tokens: int = 6000, max_workers: int = 4,
+                         prompt: str = chunk_prompt) -> str:
+    """
+    Map-summarize text until it fits in one chunk and return the result.
+
+    Each round runs the chunk summaries in parallel, so latency follows the
+    longest chunk per round rather than the total transcript length. If a
+    round stops shrinking the text, the shorter text is cut to max_tokens
+    at a sentence boundary.
+    """
+    while True:
+        chunks = chunk_transcript(text, max_tokens)
+        if len(chunks) <= 1:
+            return text
+
+        logger.info(f"Summarizing {len(chunks)} transcript chunks "
+                    f"(~{estimate_tokens(text)} tokens)")
+        combined = "\n\n".join(map_summaries(chunks, summarize_fn, prompt, max_workers))
+        if len(combined) >= len(text):
+            # Summaries stopped shrinking the text; reduce as much as fits
+            truncated = chunk_transcript(text, max_tokens)[0]
+            logger.warning(f"Chunk summaries no longer shrink the text (~{estimate_tokens(text)} -> "
+                           f"~{estimate_tokens(combined)} tokens); truncating to "
+                           f"~{estimate_tokens(truncated)} tokens for the reduce step")
+            return truncated
+        text = combined
+
+
+def map_reduce_summarize(text: str, summarize_fn: Callable[[str, str], str], reduce_prompt: str,
+                         max_tokens: int = 6000, max_workers: int = 4) -> str:
+    """
+    Summarize text of any length with summarize_fn(text, prompt).
+
+    Short text takes a single call with reduce_prompt; long text is
+    summarized chunk by chunk first, then reduced with reduce_prompt.
+    """
+    reduce_input = prepare_reduce_input(text, summarize_fn, max_tokens, max_workers)
+    return summarize_fn(reduce_input, reduce_prompt)
@@ -0,0 +1,398 @@
+"""Rate-limited, retrying access to the LLM and speech-to-text providers."""
+import io
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from streaming import FakeStreamProvider, use_fake_provider
+from telemetry import (in_context, provider_hedges, provider_request_seconds, provider_retries,
+                       provider_throttle_seconds)
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: throttling, timeouts and server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Exception class names used by the openai and google clients for the same
+RETRYABLE_NAMES = ('RateLimit', 'Timeout', 'ServiceUnavailable', 'APIConnection',
+                   'ResourceExhausted', 'DeadlineExceeded', 'InternalServerError', 'TryAgain')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, at most capacity banked.
+
+    acquire() blocks until a token is available, smoothing bursts out to
+    the provider's quota instead of letting them turn into 429s.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, sleeping as needed; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LocalRateLimitError(RuntimeError):
+    """Raised by LocalBackend to simulate a provider 429."""
+    http_status = 429
+
+
+def is_retryable(e: Exception) -> bool:
+    """True for throttling, timeouts, connection and server errors."""
+    status = getattr(e, 'http_status', None) or getattr(e, 'status_code', None) or getattr(e, 'code', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    name = type(e).__name__
+    return any(part in name for part in RETRYABLE_NAMES)
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, if it sent a Retry-After header."""
+    headers = getattr(e, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after') or headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, backoff: float, max_backoff: float) -> float:
+    """Exponential backoff with full jitter, so retrying clients spread out."""
+    return random.uniform(0, min(max_backoff, backoff * (2 ** attempt)))
+
+
+def retry_call(fn: Callable[[], str], retries: int = 3, backoff: float = 0.5,
+               max_backoff: float = 30.0, on_retry: Optional[Callable[[], None]] = None):
+    """Call fn(), retrying retryable errors with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = retry_after(e) or backoff_delay(attempt, backoff, max_backoff)
+            logger.warning(f"Provider call failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+            if on_retry:
+                on_retry()
+            time.sleep(delay)
+
+
+def hedged(fn: Callable[[], str], hedge_after: Optional[float], pool: ThreadPoolExecutor,
+           on_hedge: Optional[Callable[[], None]] = None):
+    """
+    Run fn() and, if it has not finished after hedge_after seconds, a second
+    copy alongside it; the first successful result wins.
+
+    Only for idempotent calls. The losing call is left to finish in the pool.
+    """
+    if hedge_after is None:
+        return fn()
+
+    primary = pool.submit(fn)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    if on_hedge:
+        on_hedge()
+    pending = {primary, pool.submit(fn)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+class GeminiBackend:
+    """google.generativeai; one GenerativeModel per model name is reused."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("GENAI_API_KEY")
+        self._models: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def model(self, name: str):
+        with self._lock:
+            if name not in self._models:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def complete(self, model: str, prompt: str) -> str:
+        return self.model(model).generate_content(prompt).text
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        for chunk in self.model(model).generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+class OpenAIBackend:
+    """
+    openai (0.x client) configured once, sending every request through a
+    shared keep-alive HTTP session sized for the expected concurrency.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, pool_size: int = 16):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.pool_size = pool_size
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import openai
+                import requests
+                from requests.adapters import HTTPAdapter
+                openai.api_key = self.api_key
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                openai.requestssession = session
+                self._client = openai
+            return self._client
+
+    def chat(self, model: str, messages: List[Dict], max_tokens: int) -> str:
+        response = self.client().ChatCompletion.create(
+            model=model, messages=messages, max_tokens=max_tokens)
+        return response['choices'][0]['message']['content'].strip()
+
+    def chat_stream(self, model: str, messages: List[Dict], max_tokens: int) -> Iterator[str]:
+        response = self.client().ChatCompletion.create(
+            model=model, messages=messages, max_tokens=max_tokens, stream=True)
+        for chunk in response:
+            yield chunk['choices'][0].get('delta', {}).get('content', '')
+
+    def transcribe(self, model: str, audio_file: BinaryIO) -> str:
+        return self.client().Audio.transcribe(model=model, file=audio_file)['text']
+
+
+class LocalBackend:
+    """
+    In-process stand-in for every provider, for tests and benchmarks.
+
+    Each call sleeps for latency seconds; a slow_rate fraction of calls take
+    slow_factor times longer (the tail hedging targets) and a
+    throttle_rate fraction raise a simulated 429.
+    """
+
+    def __init__(self, latency: float = 0.3, slow_rate: float = 0.0, slow_factor: float = 10.0,
+                 throttle_rate: float = 0.0, chunk_size: int = 8, chunk_delay: float = 0.02):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.throttle_rate = throttle_rate
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+
+    def _wait(self):
+        if random.random() < self.throttle_rate:
+            raise LocalRateLimitError("simulated rate limit")
+        slow = random.random() < self.slow_rate
+        time.sleep(self.latency * (self.slow_factor if slow else 1))
+
+    def complete(self, model: str, prompt: str) -> str:
+        self._wait()
+        return f"Local {model} completion for a {len(prompt)}-character prompt."
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        self._wait()
+        yield from FakeStreamProvider(chunk_size=self.chunk_size, first_token_latency=0,
+                                      chunk_delay=self.chunk_delay).stream(prompt)
+
+    def chat(self, model: str, messages: List[Dict], max_tokens: int) -> str:
+        return self.complete(model, messages[-1]['content'])
+
+    def chat_stream(self, model: str, messages: List[Dict], max_tokens: int) -> Iterator[str]:
+        return self.stream(model, messages[-1]['content'])
+
+    def transcribe(self, model: str, audio_file: BinaryIO) -> str:
+        size = len(audio_file.read())
+        self._wait()
+        return f"[{audio_file.name}: {size} bytes]"
+
+
+class Provider:
+    """
+    Front end to one backend that every caller shares.
+
+    Calls are paced by a token bucket per model (rate requests/second,
+    burst banked), capped at max_concurrency in flight, retried with
+    jittered backoff on throttling and server errors, and, when
+    hedge_after is set, hedged with a duplicate request once the first has
+    taken that long. Streams are paced and retried until they start, but
+    never hedged.
+    """
+
+    def __init__(self, name: str, backend, rate: float = 5.0, burst: Optional[float] = None,
+                 max_concurrency: int = 16, retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30.0, hedge_after: Optional[float] = None):
+        self.name = name
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        # Room for one hedge per in-flight call
+        self._pool = ThreadPoolExecutor(max_workers=2 * max(1, max_concurrency),
+                                        thread_name_prefix=f"provider-{name}")
+        self._limiters: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'retries': 0, 'hedges': 0, 'throttled_seconds': 0.0}
+
+    def limiter(self, model: str) -> TokenBucket:
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = TokenBucket(self.rate, self.burst)
+            return self._limiters[model]
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] += amount
+        metric = {'retries': provider_retries, 'hedges': provider_hedges,
+                  'throttled_seconds': provider_throttle_seconds}.get(name)
+        if metric:
+            metric.inc(amount, provider=self.name)
+
+    def _attempt(self, model: str, fn: Callable, args: Tuple, first_chunk: bool = False):
+        self._count('throttled_seconds', self.limiter(model).acquire())
+        with self._slots:
+            self._count('calls')
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = fn(*args)
+                if first_chunk:
+                    # Generators only contact the provider on the first next()
+                    result = (result, next(result, None))
+                outcome = 'ok'
+                return result
+            finally:
+                provider_request_seconds.observe(time.perf_counter() - start, provider=self.name,
+                                                 model=model, outcome=outcome)
+
+    def call(self, model: str, fn: Callable, *args, hedge: bool = True):
+        """Run fn(*args) against model with pacing, retries and hedging."""
+        # Hedges run on the pool; keep the caller's trace ID there
+        @in_context
+        def attempt():
+            return self._attempt(model, fn, args)
+
+        hedge_after = self.hedge_after if hedge else None
+        return retry_call(
+            lambda: hedged(attempt, hedge_after, self._pool, lambda: self._count('hedges')),
+            self.retries, self.backoff, self.max_backoff, lambda: self._count('retries'))
+
+    def call_stream(self, model: str, fn: Callable[..., Iterator[str]], *args) -> Iterator[str]:
+        """Yield from fn(*args); errors before the first chunk are retried."""
+        def start():
+            return self._attempt(model, fn, args, first_chunk=True)
+
+        chunks, first = retry_call(start, self.retries, self.backoff, self.max_backoff,
+                                   lambda: self._count('retries'))
+        if first is not None:
+            yield first
+        yield from chunks
+
+    def complete(self, prompt: str, model: str) -> str:
+        return self.call(model, self.backend.complete, model, prompt)
+
+    def stream(self, prompt: str, model: str) -> Iterator[str]:
+        return self.call_stream(model, self.backend.stream, model, prompt)
+
+    def chat(self, messages: List[Dict], model: str, max_tokens: int = 150) -> str:
+        return self.call(model, self.backend.chat, model, messages, max_tokens)
+
+    def chat_stream(self, messages: List[Dict], model: str, max_tokens: int = 150) -> Iterator[str]:
+        return self.call_stream(model, self.backend.chat_stream, model, messages, max_tokens)
+
+    def transcribe(self, audio_file: BinaryIO, model: str = "whisper-1") -> str:
+        """Transcribe audio; each attempt gets its own copy of the buffer."""
+        data = audio_file.read()
+        name = getattr(audio_file, 'name', 'audio.ogg')
+
+        def transcribe_copy():
+            buffer = io.BytesIO(data)
+            buffer.name = name
+            return self.backend.transcribe(model, buffer)
+
+        return self.call(model, transcribe_copy)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, name=self.name, rate=self.rate)
+
+
+BACKENDS: Dict[str, Callable[[], object]] = {
+    'gemini': GeminiBackend,
+    'openai': OpenAIBackend,
+    'local': LocalBackend,
+}
+
+# Requests per second and tail-latency hedge delays per provider;
+# override with <NAME>_RATE, <NAME>_BURST, <NAME>_CONCURRENCY, <NAME>_HEDGE_AFTER
+DEFAULT_RATES = {'gemini': 1.0, 'openai': 3.0, 'local': 50.0}
+
+_providers: Dict[str, Provider] = {}
+_providers_lock = threading.Lock()
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def get_provider(name: str) -> Provider:
+    """
+    Process-wide Provider for 'gemini', 'openai' or 'local'.
+
+    With LLM_PROVIDER=fake every provider keeps its limits but is backed
+    by LocalBackend.
+    """
+    with _providers_lock:
+        if name not in _providers:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown provider: {name}")
+            backend = LocalBackend() if use_fake_provider() else BACKENDS[name]()
+            prefix = name.upper()
+            _providers[name] = Provider(
+                name, backend,
+                rate=_env_float(f'{prefix}_RATE') or DEFAULT_RATES[name],
+                burst=_env_float(f'{prefix}_BURST'),
+                max_concurrency=int(os.getenv(f'{prefix}_CONCURRENCY', '16')),
+                retries=int(os.getenv(f'{prefix}_RETRIES', '3')),
+                hedge_after=_env_float(f'{prefix}_HEDGE_AFTER'))
+        return _providers[name]
+
+
+def provider_stats() -> List[Dict]:
+    with _providers_lock:
+        return [provider.stats() for provider in _providers.values()]
@@ -0,0 +1,429 @@
+"""ffmpeg-based helpers for cutting and encoding summary videos."""
+import json
+import logging
+import math
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Regions closer than this after keyframe snapping are joined into one cut
+MERGE_GAP = 0.05
+# Length of HLS media segments; keyframes are forced on this grid
+HLS_SEGMENT_SECONDS = 4
+# Frame height of preview renders (never upscaled)
+PREVIEW_HEIGHT = 360
+# ffprobe H.264 profile names -> libx264 -profile:v values
+X264_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+    'High 10': 'high10',
+    'High 4:2:2': 'high422',
+    'High 4:4:4 Predictive': 'high444',
+}
+
+
+def run_ffmpeg(args: List[str]) -> subprocess.CompletedProcess:
+    """Run an ffmpeg/ffprobe command, raising on failure."""
+    return subprocess.run(args, capture_output=True, text=True, check=True)
+
+
+def probe_stream_info(video_path: Path) -> dict:
+    """Return duration and codec parameters of the first video/audio streams."""
+    result = run_ffmpeg([
+        'ffprobe', '-v', 'error',
+        '-show_entries',
+        'format=duration:stream=codec_type,codec_name,profile,level,width,height,'
+        'pix_fmt,r_frame_rate,time_base,sample_rate,channels',
+        '-of', 'json', str(video_path)
+    ])
+    data = json.loads(result.stdout)
+    info = {'duration': float(data.get('format', {}).get('duration', 0.0))}
+    for stream in data.get('streams', []):
+        codec_type = stream.get('codec_type')
+        if codec_type in ('video', 'audio') and codec_type not in info:
+            info[codec_type] = stream
+    return info
+
+
+def matches_x264(stream_info: dict) -> bool:
+    """Whether libx264 can encode with the source video's codec and profile."""
+    video = stream_info.get('video', {})
+    return video.get('codec_name') == 'h264' and video.get('profile') in X264_PROFILES
+
+
+def codec_params(video_path: Path) -> tuple:
+    """The codec parameters that must agree for segments to be joined by stream copy."""
+    info = probe_stream_info(video_path)
+    video, audio = info.get('video', {}), info.get('audio', {})
+    return (tuple(video.get(key) for key in
+                  ('codec_name', 'profile', 'level', 'width', 'height', 'pix_fmt', 'r_frame_rate')),
+            tuple(audio.get(key) for key in ('codec_name', 'profile', 'sample_rate', 'channels')))
+
+
+def probe_keyframes(video_path: Path) -> np.ndarray:
+    """
+    Return sorted keyframe timestamps (seconds) of the first video stream.
+
+    Reads packet flags only, so no frames are decoded.
+    """
+    result = run_ffmpeg([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0', str(video_path)
+    ])
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        try:
+            keyframes.append(float(parts[0]))
+        except ValueError:
+            continue
+    return np.unique(np.asarray(keyframes, dtype=np.float64))
+
+
+def snap_regions(regions: List[Tuple[float, float]], keyframes: np.ndarray,
+                 video_duration: float) -> List[Tuple[float, float]]:
+    """
+    Widen each region to the surrounding keyframes so it can be stream copied.
+
+    Starts move back to the previous keyframe and ends move forward to the
+    next one (or the end of the video); overlapping results are merged.
+    """
+    if not regions:
+        return []
+    if len(keyframes) == 0:
+        keyframes = np.zeros(1, dtype=np.float64)
+
+    snapped = []
+    for start, end in sorted(regions):
+        start_idx = max(0, np.searchsorted(keyframes, start, side='right') - 1)
+        end_idx = np.searchsorted(keyframes, end, side='left')
+        new_start = float(keyframes[start_idx])
+        new_end = float(keyframes[end_idx]) if end_idx < len(keyframes) else video_duration
+        if video_duration > 0:
+            new_end = min(new_end, video_duration)
+        if new_end > new_start:
+            snapped.append((new_start, new_end))
+
+    merged = [snapped[0]] if snapped else []
+    for start, end in snapped[1:]:
+        if start - merged[-1][1] <= MERGE_GAP:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def split_at_keyframes(region: Tuple[float, float],
+                       keyframes: np.ndarray) -> List[Tuple[float, float, bool]]:
+    """
+    Split a region into (start, end, copy) pieces for a frame-accurate cut.
+
+    The middle piece between the first and last keyframe inside the region is
+    stream copied; the short head and tail GOPs around it are re-encoded.
+    """
+    start, end = region
+    inner = keyframes[(keyframes >= start) & (keyframes <= end)]
+    if len(inner) < 2:
+        return [(start, end, False)]
+
+    first, last = float(inner[0]), float(inner[-1])
+    pieces = []
+    if first > start:
+        pieces.append((start, first, False))
+    pieces.append((first, last, True))
+    if end > last:
+        pieces.append((last, end, False))
+    return pieces
+
+
+def copy_segment(video_path: Path, start: float, end: float, output_path: Path) -> Path:
+    """Extract [start, end) by stream copy; start should be a keyframe."""
+    run_ffmpeg([
+        'ffmpeg', '-y', '-v', 'error',
+        '-ss', f"{start:.6f}", '-i', str(video_path),
+        '-t', f"{end - start:.6f}",
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+        str(output_path)
+    ])
+    return output_path
+
+
+def encoder_args(stream_info: dict, threads: Optional[int] = None,
+                 preview_height: Optional[int] = None) -> List[str]:
+    """
+    Encoder options that match the source's codec parameters.
+
+    With preview_height the video is scaled down to at most that height and
+    encoded with the ultrafast preset at low quality, for a quick look.
+    """
+    video = stream_info.get('video', {})
+    audio = stream_info.get('audio', {})
+    if preview_height:
+        height = min(preview_height, video.get('height') or preview_height)
+        # Even dimensions, as yuv420p requires
+        args = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '32',
+                '-pix_fmt', 'yuv420p', '-vf', f"scale=-2:{height - height % 2}"]
+    else:
+        args = ['-c:v', 'libx264', '-preset', 'veryfast']
+        if video.get('pix_fmt'):
+            args += ['-pix_fmt', video['pix_fmt']]
+        if matches_x264(stream_info):
+            args += ['-profile:v', X264_PROFILES[video['profile']]]
+            if (video.get('level') or 0) > 0:
+                args += ['-level:v', f"{video['level'] / 10:g}"]
+    if video.get('r_frame_rate') and video['r_frame_rate'] != '0/0':
+        args += ['-r', video['r_frame_rate']]
+    if video.get('width') and video.get('height') and not preview_height:
+        args += ['-s', f"{video['width']}x{video['height']}"]
+    args += ['-c:a', 'aac']
+    if preview_height:
+        args += ['-b:a', '64k']
+    if audio.get('sample_rate'):
+        args += ['-ar', str(audio['sample_rate'])]
+    if audio.get('channels'):
+        args += ['-ac', str(audio['channels'])]
+    if threads:
+        args += ['-threads', str(threads)]
+    return args
+
+
+def encode_segment(video_path: Path, start: float, end: float, output_path: Path,
+                   stream_info: dict, threads: Optional[int] = None,
+                   preview_height: Optional[int] = None) -> Path:
+    """Re-encode [start, end) with parameters matching the source (or as a preview)."""
+    run_ffmpeg([
+        'ffmpeg', '-y', '-v', 'error',
+        '-ss', f"{start:.6f}", '-i', str(video_path),
+        '-t', f"{end - start:.6f}",
+        '-map', '0:v:0', '-map', '0:a:0?',
+        *encoder_args(stream_info, threads, preview_height),
+        '-avoid_negative_ts', 'make_zero',
+        str(output_path)
+    ])
+    return output_path
+
+
+def concat_segments(segments: List[Path], output_path: Path,
+                    stream_info: Optional[dict] = None) -> Path:
+    """
+    Join segments losslessly with the ffmpeg concat demuxer.
+
+    With stream_info the video track keeps the source's timescale.
+    """
+    list_path = output_path.with_suffix('.concat.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for segment in segments:
+            escaped = str(Path(segment).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    time_base = (stream_info or {}).get('video', {}).get('time_base', '')
+    timescale = time_base.split('/')[-1] if time_base.startswith('1/') else None
+    try:
+        run_ffmpeg([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'concat', '-safe', '0', '-i', str(list_path),
+            '-c', 'copy', '-movflags', '+faststart',
+            *(['-video_track_timescale', timescale] if timescale else []),
+            str(output_path)
+        ])
+    finally:
+        list_path.unlink(missing_ok=True)
+    return output_path
+
+
+def fast_cut(video_path: Path, regions: List[Tuple[float, float]], output_path: Path,
+             work_dir: Path, frame_accurate: bool = False) -> Path:
+    """
+    Cut regions out of video_path mostly by stream copy.
+
+    Without frame_accurate, regions are snapped outward to keyframes and
+    copied as-is. With it, only the boundary GOPs are re-encoded, with the
+    source's profile and level. Those pieces are cut as MPEG-TS so each one
+    carries its own SPS/PPS in-band, and they are probed before joining:
+    if their codec parameters differ from the copied pieces (or libx264
+    cannot produce the source's codec at all) the regions are re-encoded
+    in full instead.
+    """
+    stream_info = probe_stream_info(video_path)
+    keyframes = probe_keyframes(video_path)
+
+    if not frame_accurate:
+        pieces = [(start, end, True) for start, end in
+                  snap_regions(regions, keyframes, stream_info['duration'])]
+        segments = cut_pieces(video_path, pieces, work_dir, stream_info, '.mp4')
+    elif not matches_x264(stream_info):
+        logger.info(f"Cannot match {stream_info.get('video', {}).get('codec_name')} "
+                    f"video with libx264, re-encoding regions in full")
+        pieces = [(start, end, False) for start, end in sorted(regions)]
+        segments = cut_pieces(video_path, pieces, work_dir, stream_info, '.mp4')
+    else:
+        pieces = [piece for region in sorted(regions)
+                  for piece in split_at_keyframes(region, keyframes)]
+        segments = cut_pieces(video_path, pieces, work_dir, stream_info, '.ts')
+        if len({codec_params(segment) for segment in segments}) > 1:
+            logger.warning("Re-encoded boundary pieces do not match the source's codec parameters, "
+                           "re-encoding regions in full")
+            pieces = [(start, end, False) for start, end in sorted(regions)]
+            segments = cut_pieces(video_path, pieces, work_dir, stream_info, '.mp4')
+
+    logger.info(f"Cut {len(segments)} segments "
+                f"({sum(1 for p in pieces if p[2])} stream copied)")
+    return concat_segments(segments, output_path, stream_info)
+
+
+def cut_pieces(video_path: Path, pieces: List[Tuple[float, float, bool]], work_dir: Path,
+               stream_info: dict, suffix: str) -> List[Path]:
+    """Write each (start, end, copy) piece to its own segment file."""
+    segments = []
+    for i, (start, end, copy) in enumerate(pieces):
+        segment_path = work_dir / f"segment_{i:05d}{suffix}"
+        if copy:
+            copy_segment(video_path, start, end, segment_path)
+        else:
+            encode_segment(video_path, start, end, segment_path, stream_info)
+        segments.append(segment_path)
+    return segments
+
+
+def default_parallelism(workers: Optional[int] = None,
+                        threads_per_worker: Optional[int] = None,
+                        jobs: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Fill in worker and per-worker thread counts from the CPU count.
+
+    Workers are capped at jobs first, so CPUs that idle workers would get
+    go to the threads of the busy ones.
+    """
+    cpus = os.cpu_count() or 1
+    workers = max(1, workers or cpus)
+    if jobs:
+        workers = min(workers, jobs)
+    threads_per_worker = max(1, threads_per_worker or cpus // workers)
+    return workers, threads_per_worker
+
+
+def parallel_encode(video_path: Path, regions: List[Tuple[float, float]], output_path: Path,
+                    work_dir: Path, workers: Optional[int] = None,
+                    threads_per_worker: Optional[int] = None,
+                    preview_height: Optional[int] = None) -> Path:
+    """
+    Encode each region in its own ffmpeg process, then concat them losslessly.
+
+    All segments share the same encoder parameters, so the concat demuxer can
+    join them with stream copy. preview_height makes a low-resolution
+    preview (see encoder_args).
+    """
+    stream_info = probe_stream_info(video_path)
+    regions = sorted(regions)
+    workers, threads_per_worker = default_parallelism(workers, threads_per_worker, len(regions))
+    prefix = "preview" if preview_height else "segment"
+    segments = [work_dir / f"{prefix}_{i:05d}.mp4" for i in range(len(regions))]
+
+    logger.info(f"Encoding {len(regions)} regions with {workers} workers "
+                f"x {threads_per_worker} threads")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(encode_segment, video_path, start, end, segment,
+                        stream_info, threads_per_worker, preview_height)
+            for (start, end), segment in zip(regions, segments)
+        ]
+        for future in futures:
+            future.result()
+
+    return concat_segments(segments, output_path)
+
+
+def write_hls_playlist(playlist_path: Path, segments: List[Tuple[str, float]],
+                       segment_seconds: float, finished: bool):
+    """
+    Atomically (re)write an EVENT playlist listing segments so far.
+
+    Players poll an unfinished playlist for new segments; #EXT-X-ENDLIST
+    marks it complete.
+    """
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{math.ceil(segment_seconds) + 1}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:EVENT',
+    ]
+    for name, duration in segments:
+        lines += [f'#EXTINF:{duration:.3f},', name]
+    if finished:
+        lines.append('#EXT-X-ENDLIST')
+
+    tmp_path = playlist_path.with_suffix('.m3u8.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, playlist_path)
+
+
+def hls_encode(video_path: Path, regions: List[Tuple[float, float]], playlist_path: Path,
+               work_dir: Path, segment_seconds: float = HLS_SEGMENT_SECONDS,
+               threads: Optional[int] = None,
+               on_update: Optional[Callable[[Path, int, int], None]] = None) -> Path:
+    """
+    Encode regions in order into MPEG-TS segments next to an HLS playlist.
+
+    The playlist is republished after every region, so playback can begin
+    as soon as the first region is encoded. Timestamps continue across
+    regions, so no discontinuities are needed. on_update is called with
+    (playlist_path, regions_done, regions_total).
+    """
+    stream_info = probe_stream_info(video_path)
+    regions = sorted(regions)
+    out_dir = playlist_path.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    segments: List[Tuple[str, float]] = []
+    offset = 0.0
+    for i, (start, end) in enumerate(regions):
+        list_path = work_dir / f"region_{i:05d}.csv"
+        run_ffmpeg([
+            'ffmpeg', '-y', '-v', 'error',
+            '-ss', f"{start:.6f}", '-i', str(video_path),
+            '-t', f"{end - start:.6f}",
+            '-map', '0:v:0', '-map', '0:a:0?',
+            *encoder_args(stream_info, threads),
+            '-force_key_frames', f"expr:gte(t,n_forced*{segment_seconds})",
+            '-output_ts_offset', f"{offset:.6f}",
+            '-f', 'segment', '-segment_format', 'mpegts',
+            '-segment_time', str(segment_seconds),
+            '-segment_list', str(list_path), '-segment_list_type', 'csv',
+            str(out_dir / f"region{i:05d}_%05d.ts")
+        ])
+        with open(list_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                name, segment_start, segment_end = line.strip().rsplit(',', 2)
+                segments.append((Path(name).name, float(segment_end) - float(segment_start)))
+        offset += end - start
+
+        write_hls_playlist(playlist_path, segments, segment_seconds, finished=False)
+        if on_update:
+            on_update(playlist_path, i + 1, len(regions))
+
+    write_hls_playlist(playlist_path, segments, segment_seconds, finished=True)
+    return playlist_path
+
+
+def hls_to_mp4(playlist_path: Path, output_path: Path) -> Path:
+    """Remux a finished HLS rendition into one MP4 by stream copy."""
+    run_ffmpeg([
+        'ffmpeg', '-y', '-v', 'error',
+        '-i', str(playlist_path),
+        '-c', 'copy', '-bsf:a', 'aac_adtstoasc', '-movflags', '+faststart',
+        str(output_path)
+    ])
+    return output_path
@@ -0,0 +1,228 @@
+"""BM25 retrieval over timestamped transcript segments, cached per video."""
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Common English words that only add noise to BM25 scores
+STOPWORDS = frozenset("""
+a an and are as at be but by do does did for from had has have he her his how i if in
+into is it its me my no not of on or our she so that the their them then there these
+they this to was we were what when where which who why will with you your
+""".split())
+
+SEGMENT_SECONDS = 30.0
+SEGMENT_MAX_CHARS = 800
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def group_segments(lines: Iterable[Tuple[float, float, str]], window: float = SEGMENT_SECONDS,
+                   max_chars: int = SEGMENT_MAX_CHARS) -> List[Tuple[float, float, str]]:
+    """Merge consecutive (start, end, text) lines into segments of about window seconds."""
+    segments = []
+    start = end = None
+    parts: List[str] = []
+    size = 0
+    for line_start, line_end, text in lines:
+        if parts and (line_end - start > window or size + len(text) > max_chars):
+            segments.append((start, end, ' '.join(parts)))
+            parts, size = [], 0
+        if not parts:
+            start = line_start
+        end = line_end
+        parts.append(text)
+        size += len(text) + 1
+    if parts:
+        segments.append((start, end, ' '.join(parts)))
+    return segments
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class TranscriptIndex:
+    """
+    Okapi BM25 index over transcript segments.
+
+    Postings are stored term-major in flat arrays with the BM25 weight of
+    each (term, segment) pair precomputed, so a query only sums the weight
+    slices of its terms.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, text_offsets: np.ndarray, text: str,
+                 terms: List[str], term_offsets: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self.text_offsets = text_offsets
+        self.text = text
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+
+    @classmethod
+    def build(cls, segments: List[Tuple[float, float, str]],
+              k1: float = 1.5, b: float = 0.75) -> 'TranscriptIndex':
+        n = len(segments)
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(n, dtype=np.float64)
+        for doc, (_, _, text) in enumerate(segments):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                tfs.append(tf)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        doc_ids = np.array(doc_ids, dtype=np.int32)
+        tfs = np.array(tfs, dtype=np.float64)
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=term_offsets[1:])
+
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avg_length = lengths.mean() if n else 0.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / (avg_length or 1.0))
+        weights = (idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+        texts = [segment[2] for segment in segments]
+        text_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+        terms = sorted(vocabulary, key=vocabulary.get)
+        return cls(np.array([s[0] for s in segments], dtype=np.float64),
+                   np.array([s[1] for s in segments], dtype=np.float64),
+                   text_offsets, ''.join(texts), terms, term_offsets, doc_ids, weights)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment_text(self, i: int) -> str:
+        return self.text[self.text_offsets[i]:self.text_offsets[i + 1]]
+
+    def segments(self) -> List[Tuple[float, float, str]]:
+        """The indexed (start, end, text) segments in order."""
+        return [(float(self.starts[i]), float(self.ends[i]), self.segment_text(i))
+                for i in range(len(self))]
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """Top-k segments for query, best first, as dicts with start/end/text/score."""
+        if k <= 0:
+            return []
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            # A term occurs at most once per segment, so no index repeats
+            scores[self.doc_ids[lo:hi]] += self.weights[lo:hi]
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [{'start': float(self.starts[i]), 'end': float(self.ends[i]),
+                 'text': self.segment_text(i), 'score': float(scores[i])}
+                for i in candidates]
+
+    def save(self, path: Path):
+        """Write the index to path atomically."""
+        tmp_path = Path(f"{path}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, starts=self.starts, ends=self.ends, text_offsets=self.text_offsets,
+                     text=np.frombuffer(self.text.encode('utf-8'), dtype=np.uint8),
+                     terms=np.frombuffer('\n'.join(self.terms).encode('utf-8'), dtype=np.uint8),
+                     term_offsets=self.term_offsets, doc_ids=self.doc_ids, weights=self.weights)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'TranscriptIndex':
+        with np.load(path) as data:
+            terms = data['terms'].tobytes().decode('utf-8')
+            return cls(data['starts'], data['ends'], data['text_offsets'],
+                       data['text'].tobytes().decode('utf-8'),
+                       terms.split('\n') if terms else [],
+                       data['term_offsets'], data['doc_ids'], data['weights'])
+
+
+class TranscriptIndexStore:
+    """
+    Per-video indexes on disk under root, with the most recently used
+    max_loaded kept in memory.
+    """
+
+    def __init__(self, root: str = "transcript_index", max_loaded: int = 32):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_loaded = max_loaded
+        self._loaded: 'OrderedDict[str, TranscriptIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, video: str) -> Path:
+        return self.root / f"{hashlib.sha256(video.encode('utf-8')).hexdigest()[:32]}.npz"
+
+    def get(self, video: str) -> Optional[TranscriptIndex]:
+        with self._lock:
+            if video in self._loaded:
+                self._loaded.move_to_end(video)
+                return self._loaded[video]
+
+        path = self.path(video)
+        if not path.exists():
+            return None
+        try:
+            index = TranscriptIndex.load(path)
+        except Exception as e:
+            logger.warning(f"Could not load transcript index {path}: {str(e)}")
+            return None
+        self._remember(video, index)
+        return index
+
+    def put(self, video: str, segments: List[Tuple[float, float, str]]) -> TranscriptIndex:
+        index = TranscriptIndex.build(segments)
+        index.save(self.path(video))
+        self._remember(video, index)
+        logger.info(f"Indexed {len(index)} transcript segments for {video}")
+        return index
+
+    def _remember(self, video: str, index: TranscriptIndex):
+        with self._lock:
+            self._loaded[video] = index
+            self._loaded.move_to_end(video)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+
+_default_store: Optional[TranscriptIndexStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_index_store() -> TranscriptIndexStore:
+    """Process-wide store rooted at TRANSCRIPT_INDEX_DIR."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TranscriptIndexStore(os.getenv('TRANSCRIPT_INDEX_DIR', 'transcript_index'))
+        return _default_store
@@ -0,0 +1,152 @@
+"""Sentence importance scorers for summaries, selectable by name."""
+import logging
+import os
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from retrieval import tokenize
+
+if TYPE_CHECKING:
+    from app import SentenceTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCORER = "heuristic"
+# TextRank damping factor and power-iteration stopping rule (L1 change)
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+
+def heuristic_scores(sentences: 'SentenceTable') -> np.ndarray:
+    """
+    Score all sentences in one batch.
+
+    POS tagging runs once over every sentence (pos_tag_sents) and the
+    noun/verb/length/duration features are combined with NumPy, giving the
+    same scores as scoring each sentence on its own.
+    """
+    import nltk
+    from nltk.tag import pos_tag_sents
+
+    n = len(sentences)
+    if not n:
+        return np.zeros(0, dtype=np.float64)
+
+    tagged = pos_tag_sents([nltk.word_tokenize(text) for text in sentences.texts])
+
+    num_tokens = np.fromiter((len(t) for t in tagged), dtype=np.int64, count=n)
+    num_content = np.fromiter(
+        (sum(1 for _, pos in t if pos.startswith(('NN', 'VB'))) for t in tagged),
+        dtype=np.int64, count=n)
+    text_lengths = np.fromiter(
+        (len(text) for text in sentences.texts), dtype=np.float64, count=n)
+
+    content_score = np.divide(num_content, num_tokens,
+                              out=np.zeros(n, dtype=np.float64),
+                              where=num_tokens > 0)
+    # Favor medium-length sentences
+    length_score = np.minimum(1.0, text_lengths / 100)
+    # Favor segments 2-5 seconds
+    duration_score = np.minimum(1.0, sentences.durations / 5)
+
+    return content_score * 0.4 + length_score * 0.3 + duration_score * 0.3
+
+
+def tfidf_matrix(sentences: 'SentenceTable') -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    L2-normalized TF-IDF rows of the sentences as a sparse matrix in
+    coordinate form: (rows, term ids, values, vocabulary size).
+    """
+    vocabulary: Dict[str, int] = {}
+    rows, term_ids = [], []
+    for row, text in enumerate(sentences.texts):
+        ids = [vocabulary.setdefault(term, len(vocabulary)) for term in tokenize(text)]
+        term_ids.extend(ids)
+        rows.extend([row] * len(ids))
+
+    # Count repeated (sentence, term) pairs in one pass
+    n_terms = max(len(vocabulary), 1)
+    pairs = np.array(rows, dtype=np.int64) * n_terms + np.array(term_ids, dtype=np.int64)
+    pairs, tfs = np.unique(pairs, return_counts=True)
+    rows, term_ids = np.divmod(pairs, n_terms)
+    df = np.bincount(term_ids, minlength=len(vocabulary))
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+    values = np.log1p(tfs.astype(np.float64)) * idf[term_ids]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(sentences)))
+    values /= norms[rows]
+    return rows, term_ids, values, len(vocabulary)
+
+
+def tfidf_scores(sentences: 'SentenceTable') -> np.ndarray:
+    """
+    TF-IDF centrality: cosine similarity of each sentence to the centroid
+    of all sentences, so sentences about the main topics score highest.
+    """
+    n = len(sentences)
+    if not n:
+        return np.zeros(0, dtype=np.float64)
+    rows, term_ids, values, n_terms = tfidf_matrix(sentences)
+    if not len(values):
+        return np.zeros(n, dtype=np.float64)
+
+    centroid = np.bincount(term_ids, weights=values, minlength=n_terms)
+    centroid /= np.linalg.norm(centroid) or 1.0
+    return np.bincount(rows, weights=values * centroid[term_ids], minlength=n)
+
+
+def textrank_scores(sentences: 'SentenceTable', damping: float = DAMPING,
+                    tolerance: float = TOLERANCE, max_iterations: int = MAX_ITERATIONS) -> np.ndarray:
+    """
+    TextRank: PageRank over the graph of sentences weighted by the cosine
+    similarity of their TF-IDF vectors.
+
+    The n x n similarity matrix S = X X^T (minus self loops) is never
+    built: power iteration multiplies by X^T and then X, so each step is
+    O(nnz) time and memory. Scores are rescaled so the best sentence is 1.
+    """
+    n = len(sentences)
+    if not n:
+        return np.zeros(0, dtype=np.float64)
+    rows, term_ids, values, n_terms = tfidf_matrix(sentences)
+    if not len(values):
+        return np.zeros(n, dtype=np.float64)
+    # Rows are unit vectors, so a sentence with any terms has self similarity 1
+    self_similarity = np.bincount(rows, weights=values ** 2, minlength=n)
+
+    def similarity(v: np.ndarray) -> np.ndarray:
+        """S v without forming S."""
+        projected = np.bincount(term_ids, weights=values * v[rows], minlength=n_terms)
+        return np.bincount(rows, weights=values * projected[term_ids], minlength=n) - self_similarity * v
+
+    degree = similarity(np.ones(n))
+    dangling = degree <= 1e-12
+    degree[dangling] = 1.0
+
+    rank = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iterations + 1):
+        # S is symmetric, so the transition matrix transposed times rank is S (rank / degree)
+        spread = similarity(np.where(dangling, 0.0, rank / degree))
+        updated = (1 - damping) / n + damping * (spread + rank[dangling].sum() / n)
+        change = np.abs(updated - rank).sum()
+        rank = updated
+        if change < tolerance:
+            break
+    logger.info(f"TextRank over {n} sentences converged in {iteration} iterations")
+    return rank / rank.max()
+
+
+SCORERS: Dict[str, Callable[['SentenceTable'], np.ndarray]] = {
+    'heuristic': heuristic_scores,
+    'tfidf': tfidf_scores,
+    'textrank': textrank_scores,
+}
+
+
+def get_scorer(name: Optional[str] = None) -> Callable[['SentenceTable'], np.ndarray]:
+    """The scorer named by name or SUMMARY_SCORER (default heuristic)."""
+    name = name or os.getenv('SUMMARY_SCORER', DEFAULT_SCORER)
+    if name not in SCORERS:
+        raise ValueError(f"Unknown sentence scorer: {name}")
+    return SCORERS[name]
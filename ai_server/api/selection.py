@@ -0,0 +1,177 @@
+"""Budgeted selection of scored transcript intervals for summary videos."""
+import logging
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Intervals closer than this are cut as one region, and the gap counts against the budget
+MERGE_GAP = 0.5
+# Shorter sentences are flashes on screen rather than something to watch
+MIN_INTERVAL = 1.0
+# Shortfalls up to this many seconds are not padded
+FILL_TOLERANCE = 5.0
+# Slack for float error when comparing durations with the budget
+EPSILON = 1e-9
+
+
+class RegionSet:
+    """
+    Disjoint regions kept in time order, merged as intervals are added.
+
+    Intervals less than gap seconds apart end up in one region, so cost()
+    is exactly how much add() would grow the total duration.
+    """
+
+    def __init__(self, gap: float = MERGE_GAP):
+        self.gap = gap
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        self.total = 0.0
+
+    def _touching(self, start: float, end: float) -> Tuple[int, int]:
+        """Index range of the regions an interval would merge with."""
+        return (bisect_left(self.ends, start - self.gap),
+                bisect_right(self.starts, end + self.gap))
+
+    def cost(self, start: float, end: float) -> float:
+        lo, hi = self._touching(start, end)
+        if lo == hi:
+            return end - start
+        merged = max(end, self.ends[hi - 1]) - min(start, self.starts[lo])
+        return merged - sum(self.ends[i] - self.starts[i] for i in range(lo, hi))
+
+    def add(self, start: float, end: float):
+        lo, hi = self._touching(start, end)
+        self.total += self.cost(start, end)
+        if lo < hi:
+            start, end = min(start, self.starts[lo]), max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def regions(self) -> List[Tuple[float, float]]:
+        return list(zip(self.starts, self.ends))
+
+
+def clip_intervals(starts: np.ndarray, ends: np.ndarray,
+                   video_duration: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Intervals clamped to [0, video_duration]; ones left empty get end == start."""
+    starts = np.maximum(np.asarray(starts, dtype=np.float64), 0.0)
+    ends = np.asarray(ends, dtype=np.float64)
+    if video_duration:
+        starts = np.minimum(starts, video_duration)
+        ends = np.minimum(ends, video_duration)
+    return starts, np.maximum(ends, starts)
+
+
+def select_intervals(starts: np.ndarray, ends: np.ndarray, scores: np.ndarray, budget: float,
+                     gap: float = MERGE_GAP, min_interval: float = MIN_INTERVAL
+                     ) -> Tuple[np.ndarray, RegionSet]:
+    """
+    Pick intervals maximizing their total value while the merged regions
+    last at most budget seconds. Intervals shorter than min_interval are
+    left out.
+
+    A score rates a stretch of speech, so an interval is worth score times
+    its duration; one long good sentence beats several clipped fragments
+    of equal score. Intervals are taken greedily by score, skipping any
+    whose merged cost no longer fits; an interval overlapping chosen
+    regions only pays for the time it adds. The result is replaced by the single most valuable
+    interval that fits on its own if that is worth more (the usual
+    knapsack 1/2-approximation guard). The sort dominates: O(n log n),
+    plus O(k) per accepted interval for the k regions chosen. Returns the
+    chosen indices in time order and their regions.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    durations = ends - starts
+    candidates = np.flatnonzero(durations >= max(min_interval, EPSILON))
+    regions = RegionSet(gap)
+    if not len(candidates) or budget <= 0:
+        return np.zeros(0, dtype=np.intp), regions
+
+    values = scores * durations
+    # Highest score (value per second) first; ties go to the longer, then the earlier interval
+    order = candidates[np.lexsort((candidates, -durations[candidates], -scores[candidates]))]
+
+    chosen = []
+    total_value = 0.0
+    for i, start, end in zip(order.tolist(), starts[order].tolist(), ends[order].tolist()):
+        # With the budget used up only intervals inside the regions still fit; they change nothing
+        if regions.total >= budget - EPSILON:
+            break
+        if regions.cost(start, end) <= budget - regions.total + EPSILON:
+            regions.add(start, end)
+            chosen.append(i)
+            total_value += values[i]
+
+    alone = candidates[durations[candidates] <= budget + EPSILON]
+    best = int(alone[np.argmax(values[alone])]) if len(alone) else -1
+    if best >= 0 and values[best] > total_value:
+        regions = RegionSet(gap)
+        regions.add(float(starts[best]), float(ends[best]))
+        chosen = [best]
+
+    chosen = np.array(chosen, dtype=np.intp)
+    return chosen[np.argsort(starts[chosen], kind='stable')], regions
+
+
+def fill_regions(regions: List[Tuple[float, float]], target_duration: float,
+                 video_duration: Optional[float] = None) -> List[Tuple[float, float]]:
+    """
+    Pad regions with surrounding context until they last target_duration.
+
+    Every region edge grows by the same amount where it can: regions never
+    cross the midpoint of the gap to a neighbour, time 0 or video_duration
+    (without it, the end of the last region). So padding never overlaps
+    and never leaves the video, and the result can stay short of the target.
+    """
+    if not regions:
+        return []
+    starts = np.array([start for start, _ in regions], dtype=np.float64)
+    ends = np.array([end for _, end in regions], dtype=np.float64)
+    shortfall = target_duration - float(np.sum(ends - starts))
+    if shortfall <= 0:
+        return list(regions)
+
+    half_gaps = np.maximum(starts[1:] - ends[:-1], 0.0) / 2
+    before = np.concatenate(([starts[0]], half_gaps))
+    after = np.concatenate((half_gaps, [max(video_duration - ends[-1], 0.0) if video_duration else 0.0]))
+
+    # Water-fill: find the per-edge padding x with sum(min(room, x)) == shortfall
+    room = np.sort(np.concatenate((before, after)))
+    if room.sum() <= shortfall:
+        pad = room[-1]
+    else:
+        # Padding used if x were room[j]: the j smaller edges are full, the rest get room[j]
+        used = np.concatenate(([0.0], np.cumsum(room)[:-1]))
+        full = int(np.searchsorted(used + room * np.arange(len(room), 0, -1), shortfall))
+        pad = (shortfall - used[full]) / (len(room) - full)
+
+    starts = starts - np.minimum(before, pad)
+    ends = ends + np.minimum(after, pad)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def select_regions(starts: np.ndarray, ends: np.ndarray, scores: np.ndarray, target_duration: float,
+                   video_duration: Optional[float] = None, gap: float = MERGE_GAP,
+                   fill: bool = True) -> List[Tuple[float, float]]:
+    """
+    Summary regions from scored intervals.
+
+    Intervals are clamped to the video, the best-scoring set whose merged
+    regions fit target_duration is chosen, and with fill a shortfall of
+    more than FILL_TOLERANCE seconds is made up by padding the regions.
+    The result never exceeds target_duration or leaves [0, video_duration].
+    """
+    starts, ends = clip_intervals(starts, ends, video_duration)
+    chosen, regions = select_intervals(starts, ends, scores, target_duration, gap)
+    selected = regions.regions()
+    logger.info(f"Selected {len(chosen)} of {len(starts)} intervals in {len(selected)} regions "
+                f"({regions.total:.1f}s of {target_duration}s)")
+    if fill and target_duration - regions.total > FILL_TOLERANCE:
+        selected = fill_regions(selected, target_duration, video_duration)
+    return selected
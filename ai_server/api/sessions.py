@@ -0,0 +1,117 @@
+"""Per-session summaries and background job state in SQLite, shared by all server processes."""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600
+# Clients without a session ID share this one, like the old single summary.txt
+DEFAULT_SESSION = "default"
+SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Expired rows are dropped on about one write in PRUNE_EVERY
+PRUNE_EVERY = 200
+
+
+class SessionStore:
+    """
+    Summaries for /chat keyed by session ID, and snapshots of background
+    jobs keyed by job ID.
+
+    The store is a SQLite database in WAL mode, so every gunicorn worker and
+    thread sees the same state. Each call opens its own connection. Rows
+    not updated for ttl seconds are dropped.
+    """
+
+    def __init__(self, path: str = "sessions.sqlite3", ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    video TEXT,
+                    updated REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+
+    def save_summary(self, session_id: str, summary: str, video: Optional[str] = None):
+        """Remember the session's latest summary and the video (or upload) it belongs to."""
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                         (session_id, summary, video, time.time()))
+        self._wrote()
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT summary, video, updated FROM sessions WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+        return {'session_id': session_id, 'summary': row[0], 'video': row[1]}
+
+    def save_job(self, job: Dict):
+        """Store a job snapshot (Job.to_dict()) so any worker can answer /jobs/<id>."""
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                         (job['id'], json.dumps(job), time.time()))
+        self._wrote()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self):
+        cutoff = time.time() - self.ttl
+        with self._connect() as conn:
+            sessions = conn.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,)).rowcount
+            jobs = conn.execute("DELETE FROM jobs WHERE updated < ?", (cutoff,)).rowcount
+        if sessions or jobs:
+            logger.info(f"Pruned {sessions} sessions and {jobs} jobs from the session store")
+
+    def _wrote(self):
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+_default_store: Optional[SessionStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store configured by SESSION_DB_PATH/SESSION_TTL."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SessionStore(os.getenv('SESSION_DB_PATH', 'sessions.sqlite3'),
+                                          float(os.getenv('SESSION_TTL', DEFAULT_TTL)))
+        return _default_store
@@ -0,0 +1,61 @@
+"""Server-sent event streaming of LLM completions."""
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """Format one server-sent event with a JSON payload."""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_events(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Turn text chunks into SSE 'token' events followed by one 'done' event
+    carrying the complete text; errors end the stream with an 'error' event.
+    """
+    parts: List[str] = []
+    try:
+        for chunk in chunks:
+            if chunk:
+                parts.append(chunk)
+                yield sse_event({'text': chunk}, 'token')
+    except Exception as e:
+        yield sse_event({'error': str(e)}, 'error')
+        return
+    yield sse_event({'text': ''.join(parts)}, 'done')
+
+
+class FakeStreamProvider:
+    """
+    Offline provider that replays text in fixed-size chunks.
+
+    first_token_latency and chunk_delay (seconds) simulate provider timing
+    so streaming can be tested without network access.
+    """
+
+    def __init__(self, text: Optional[str] = None, chunk_size: int = 8,
+                 first_token_latency: float = 0.3, chunk_delay: float = 0.02):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.first_token_latency = first_token_latency
+        self.chunk_delay = chunk_delay
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text = self.text or f"Fake completion for a {len(prompt)}-character prompt."
+        time.sleep(self.first_token_latency)
+        for i in range(0, len(text), self.chunk_size):
+            if i:
+                time.sleep(self.chunk_delay)
+            yield text[i:i + self.chunk_size]
+
+
+def use_fake_provider() -> bool:
+    """LLM_PROVIDER=fake swaps real providers for the local stand-in backend."""
+    return os.getenv('LLM_PROVIDER', '').lower() == 'fake'
+
@@ -0,0 +1,129 @@
+"""Streaming SRT/VTT parsing into compact, array-backed cue storage."""
+import re
+from array import array
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import chardet
+import numpy as np
+
+# Bytes read for encoding detection; enough for chardet on caption files
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+TIMING_RE = re.compile(
+    r'(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*'
+    r'(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})')
+
+
+class Cues:
+    """
+    Subtitle cues stored column-wise.
+
+    starts/ends are float64 seconds; the text of cue i is
+    buffer[offsets[i]:offsets[i + 1]].
+    """
+    __slots__ = ('starts', 'ends', 'offsets', 'buffer')
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, offsets: np.ndarray, buffer: str):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.buffer = buffer
+
+    @classmethod
+    def from_items(cls, items: List[Tuple[float, float, str]]) -> 'Cues':
+        """Build from (start, end, text) tuples."""
+        n = len(items)
+        starts = np.fromiter((item[0] for item in items), dtype=np.float64, count=n)
+        ends = np.fromiter((item[1] for item in items), dtype=np.float64, count=n)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(item[2]) for item in items), dtype=np.int64, count=n),
+                  out=offsets[1:])
+        return cls(starts, ends, offsets, ''.join(item[2] for item in items))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text(self, i: int) -> str:
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]]
+
+    def texts(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.text(i)
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    def ranges(self) -> np.ndarray:
+        """(n, 2) array of [start, end] rows."""
+        return np.column_stack((self.starts, self.ends))
+
+
+def detect_encoding(path: Path, sample_bytes: int = ENCODING_SAMPLE_BYTES) -> str:
+    """Guess the file encoding from its first sample_bytes."""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    return chardet.detect(sample)['encoding'] or 'utf-8'
+
+
+def _seconds(hours, minutes, seconds, millis) -> float:
+    return (int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+            + int(millis) / 1000)
+
+
+def iter_cues(path: Path, encoding: str) -> Iterator[Tuple[float, float, str]]:
+    """Yield (start, end, text) for every cue, reading the file line by line."""
+    timing = None
+    lines: List[str] = []
+    with open(path, 'r', encoding=encoding, errors='replace') as f:
+        for raw in f:
+            line = raw.rstrip('\r\n')
+            match = TIMING_RE.search(line) if '-->' in line else None
+            if match:
+                if timing is not None:
+                    # A cue without a trailing blank line; drop a dangling index
+                    if lines and lines[-1].strip().isdigit():
+                        lines.pop()
+                    yield timing[0], timing[1], '\n'.join(lines)
+                groups = match.groups()
+                timing = (_seconds(*groups[:4]), _seconds(*groups[4:]))
+                lines = []
+            elif timing is not None:
+                if line.strip():
+                    lines.append(line)
+                elif lines:
+                    # Blank lines before any text (seen in YouTube VTT) are skipped
+                    yield timing[0], timing[1], '\n'.join(lines)
+                    timing = None
+                    lines = []
+    if timing is not None:
+        yield timing[0], timing[1], '\n'.join(lines)
+
+
+def parse_subtitles(path: Path, encoding: Optional[str] = None) -> Cues:
+    """Parse an SRT/VTT file into Cues without building per-cue objects."""
+    encoding = encoding or detect_encoding(path)
+    starts, ends = array('d'), array('d')
+    lengths = array('q')
+    texts: List[str] = []
+    for start, end, text in iter_cues(path, encoding):
+        starts.append(start)
+        ends.append(end)
+        lengths.append(len(text))
+        texts.append(text)
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=offsets[1:])
+    return Cues(np.frombuffer(starts, dtype=np.float64).copy(),
+                np.frombuffer(ends, dtype=np.float64).copy(),
+                offsets, ''.join(texts))
+
+
+def cues_from_pysrt(srt_file) -> Cues:
+    """Convert a pysrt.SubRipFile into Cues."""
+    def seconds(t):
+        return t.hours * 3600 + t.minutes * 60 + t.seconds + t.milliseconds / 1000
+    return Cues.from_items([(seconds(item.start), seconds(item.end), item.text) for item in srt_file])
@@ -0,0 +1,246 @@
+"""In-process tracing spans and Prometheus metrics."""
+import contextvars
+import logging
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; wide enough for both a cache lookup and a full render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Accepted incoming trace IDs (X-Request-ID); anything else gets a fresh one
+TRACE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+_trace_id: contextvars.ContextVar = contextvars.ContextVar('trace_id', default=None)
+_span_path: contextvars.ContextVar = contextvars.ContextVar('span_path', default=())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.type_name}"
+
+
+class Counter(Metric):
+    """Monotonic counter, optionally labelled."""
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self.values.get(self._key(labels), 0)
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram, optionally labelled."""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> ([count per bucket, +Inf last], sum)
+        self.values: Dict[Tuple, Tuple[list, float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self.values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self.metrics)
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+stage_seconds = Histogram('summarizer_stage_duration_seconds',
+                          'Wall time of pipeline stages', ['stage', 'status'])
+http_request_seconds = Histogram('summarizer_http_request_duration_seconds',
+                                 'HTTP request handling time', ['endpoint', 'method', 'status'])
+download_bytes = Counter('summarizer_download_bytes_total',
+                         'Bytes downloaded by yt_dlp into the download cache')
+download_cache_requests = Counter('summarizer_download_cache_requests_total',
+                                  'Download cache lookups', ['result'])
+upload_bytes = Counter('summarizer_upload_bytes_total',
+                       'Bytes of newly stored (non-duplicate) uploads')
+upload_requests = Counter('summarizer_uploads_total',
+                          'Completed uploads by whether their content was already stored', ['result'])
+llm_cache_requests = Counter('summarizer_llm_cache_requests_total',
+                             'LLM completion cache lookups', ['kind', 'result'])
+provider_request_seconds = Histogram('summarizer_provider_request_duration_seconds',
+                                     'Latency of single LLM/ASR provider requests',
+                                     ['provider', 'model', 'outcome'])
+provider_retries = Counter('summarizer_provider_retries_total',
+                           'Provider requests retried after a retryable error', ['provider'])
+provider_hedges = Counter('summarizer_provider_hedges_total',
+                          'Hedged duplicate provider requests', ['provider'])
+provider_throttle_seconds = Counter('summarizer_provider_throttle_seconds_total',
+                                    'Time spent waiting on provider rate limiters', ['provider'])
+jobs_finished = Counter('summarizer_jobs_total', 'Background jobs by final status', ['kind', 'status'])
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None):
+    """Run the block under trace_id (a new one if not given)."""
+    token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+
+def start_trace(trace_id: Optional[str] = None) -> contextvars.Token:
+    """Set the trace ID until end_trace(token), e.g. for one HTTP request."""
+    if not trace_id or not TRACE_ID_RE.match(trace_id):
+        trace_id = uuid.uuid4().hex[:16]
+    return _trace_id.set(trace_id)
+
+
+def end_trace(token: contextvars.Token):
+    _trace_id.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a pipeline stage.
+
+    The duration goes into summarizer_stage_duration_seconds and a log line
+    with the trace ID and the nested span path ("process_video/render").
+    """
+    path = _span_path.get() + (name,)
+    token = _span_path.set(path)
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _span_path.reset(token)
+        stage_seconds.observe(elapsed, stage=name, status=status)
+        details = ''.join(f" {key}={value}" for key, value in attributes.items())
+        logger.info(f"span={'/'.join(path)} status={status} duration={elapsed:.3f}s{details}")
+
+
+def traced(name: str) -> Callable:
+    """Decorator running the whole function in span(name)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_context(fn: Callable) -> Callable:
+    """
+    Wrap fn so it runs with the caller's trace ID and span path, e.g. on a
+    thread pool. Each call gets its own copy of the captured context.
+    """
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def install_log_trace_ids():
+    """Give every log record a trace_id attribute ('-' outside a trace)."""
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, 'adds_trace_id', False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = _trace_id.get() or '-'
+        return record
+    record_factory.adds_trace_id = True
+    logging.setLogRecordFactory(record_factory)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,206 @@
+"""Chunked, concurrent speech-to-text for extracted video audio."""
+import io
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from providers import get_provider
+from telemetry import in_context, span
+from vad import SpeechChunk, plan_chunks
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_LENGTH_MS = 25 * 1000  # 25 seconds
+# Whisper resamples to 16 kHz mono anyway, so send it that way
+SAMPLE_RATE = 16000
+CHUNK_FORMAT = "ogg"
+CHUNK_CODEC = "libopus"
+CHUNK_BITRATE = "24k"
+# Send only detected speech, packed into chunks that end at pauses (TRANSCRIBE_VAD=0
+# falls back to fixed CHUNK_LENGTH_MS slices)
+USE_VAD = os.getenv('TRANSCRIBE_VAD', '1') != '0'
+
+
+class OpenAIWhisperBackend:
+    """
+    Transcribes audio through the OpenAI Whisper API.
+
+    Requests go through the shared 'openai' provider, which already paces,
+    retries and hedges them.
+    """
+    handles_retries = True
+
+    def __init__(self, model: str = "whisper-1"):
+        self.model = model
+
+    def __call__(self, audio_file: BinaryIO) -> str:
+        return get_provider('openai').transcribe(audio_file, self.model)
+
+
+class StubBackend:
+    """Offline stand-in that sleeps for a fixed latency and returns dummy text."""
+
+    def __init__(self, latency: float = 0.5, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def __call__(self, audio_file: BinaryIO) -> str:
+        size = len(audio_file.read())
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("stub transcription failure")
+        return f"[{audio_file.name}: {size} bytes]"
+
+
+BACKENDS: Dict[str, Callable[[], Callable[[BinaryIO], str]]] = {
+    'openai': OpenAIWhisperBackend,
+    'stub': StubBackend,
+}
+
+
+def get_backend(name: Optional[str] = None) -> Callable[[BinaryIO], str]:
+    """Create the backend named by name or TRANSCRIBE_BACKEND (default openai)."""
+    name = name or os.getenv('TRANSCRIBE_BACKEND', 'openai')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name]()
+
+
+def split_audio(audio: 'AudioSegment', chunk_length_ms: int = CHUNK_LENGTH_MS) -> List['AudioSegment']:
+    """Cut audio into fixed-length chunks."""
+    return [audio[i:i + chunk_length_ms]
+            for i in range(0, len(audio), chunk_length_ms)]
+
+
+def split_speech(audio: 'AudioSegment', chunk_length_ms: int = CHUNK_LENGTH_MS
+                 ) -> Tuple[List['AudioSegment'], List[SpeechChunk]]:
+    """
+    Cut audio into chunks of detected speech, dropping silence and noise.
+
+    Returns the chunk audio (16 kHz mono) and, per chunk, the SpeechChunk
+    that maps its time line back to the source audio.
+    """
+    from pydub import AudioSegment
+
+    with span("vad"):
+        mono = audio.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+        samples = np.frombuffer(mono.raw_data, dtype=np.int16)
+        plan = plan_chunks(samples, SAMPLE_RATE, chunk_length_ms / 1000)
+        chunks = []
+        for chunk in plan:
+            pcm = np.concatenate([samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+                                  for start, end in chunk.spans])
+            chunks.append(AudioSegment(data=pcm.tobytes(), sample_width=2,
+                                       frame_rate=SAMPLE_RATE, channels=1))
+    return chunks, plan
+
+
+def encode_chunk(chunk: 'AudioSegment', index: int = 0) -> io.BytesIO:
+    """Encode a chunk as compact mono 16 kHz audio in memory."""
+    buffer = io.BytesIO()
+    chunk.set_channels(1).set_frame_rate(SAMPLE_RATE).export(
+        buffer, format=CHUNK_FORMAT, codec=CHUNK_CODEC, bitrate=CHUNK_BITRATE)
+    # The OpenAI client infers the audio type from the file name
+    buffer.name = f"chunk_{index:05d}.{CHUNK_FORMAT}"
+    buffer.seek(0)
+    return buffer
+
+
+def transcribe_with_retries(backend: Callable[[BinaryIO], str], buffer: io.BytesIO,
+                            retries: int = 3, backoff: float = 1.0) -> str:
+    """Call the backend, retrying failures with exponential backoff."""
+    for attempt in range(retries + 1):
+        buffer.seek(0)
+        try:
+            return backend(buffer)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"Transcribing {buffer.name} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def transcribe_chunk_texts(chunks: List['AudioSegment'], backend: Optional[Callable[[BinaryIO], str]] = None,
+                           max_workers: int = 8, retries: int = 3) -> List[str]:
+    """
+    Transcribe chunks concurrently, returning one text per chunk in order.
+
+    Each worker encodes its chunk in memory, so nothing touches the disk and
+    concurrent requests cannot overwrite each other's audio.
+    """
+    backend = backend or get_backend()
+    if getattr(backend, 'handles_retries', False):
+        retries = 0
+
+    @in_context
+    def work(indexed_chunk):
+        index, chunk = indexed_chunk
+        return transcribe_with_retries(backend, encode_chunk(chunk, index), retries)
+
+    with span("transcribe", chunks=len(chunks)), ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return [(text or "").strip() for text in pool.map(work, enumerate(chunks))]
+
+
+def transcribe_chunks(chunks: List['AudioSegment'], backend: Optional[Callable[[BinaryIO], str]] = None,
+                      max_workers: int = 8, retries: int = 3) -> str:
+    """Transcribe chunks concurrently and join the text in chunk order."""
+    texts = transcribe_chunk_texts(chunks, backend, max_workers, retries)
+    return " ".join(text for text in texts if text).strip()
+
+
+def span_segments(chunk: SpeechChunk, text: str) -> List[Tuple[float, float, str]]:
+    """
+    Split a chunk's text into one (start, end, text) segment per speech span.
+
+    Backends return plain text, so words are spread evenly over the chunk's
+    speech time and each span gets the words whose middle falls inside it.
+    """
+    words = text.split()
+    if len(chunk.spans) == 1 or not words:
+        return [(chunk.start, chunk.end, text)] if words else []
+    times = (np.arange(len(words)) + 0.5) * (chunk.duration / len(words))
+    cuts = [0, *np.searchsorted(times, chunk.offsets[1:-1]).tolist(), len(words)]
+    return [(start, end, ' '.join(words[lo:hi]))
+            for (start, end), lo, hi in zip(chunk.spans, cuts, cuts[1:]) if hi > lo]
+
+
+def transcribe_audio(audio: 'AudioSegment', backend: Optional[Callable[[BinaryIO], str]] = None,
+                     max_workers: int = 8, retries: int = 3) -> str:
+    """Split audio into chunks and transcribe them."""
+    return " ".join(text for _, _, text in transcribe_audio_segments(
+        audio, backend, max_workers, retries)).strip()
+
+
+def transcribe_audio_segments(audio: 'AudioSegment', backend: Optional[Callable[[BinaryIO], str]] = None,
+                              max_workers: int = 8, retries: int = 3,
+                              use_vad: Optional[bool] = None) -> List[Tuple[float, float, str]]:
+    """
+    Transcribe audio into (start, end, text) segments in source seconds.
+
+    With VAD there is one segment per speech span (see span_segments), so
+    the silence between spans is not covered; otherwise one per chunk.
+    """
+    if USE_VAD if use_vad is None else use_vad:
+        chunks, plan = split_speech(audio)
+        texts = transcribe_chunk_texts(chunks, backend, max_workers, retries)
+        return [segment for chunk, text in zip(plan, texts) for segment in span_segments(chunk, text)]
+
+    chunks = split_audio(audio)
+    texts = transcribe_chunk_texts(chunks, backend, max_workers, retries)
+    segments = []
+    offset = 0.0
+    for chunk, text in zip(chunks, texts):
+        duration = len(chunk) / 1000
+        if text:
+            segments.append((offset, offset + duration, text))
+        offset += duration
+    return segments
@@ -0,0 +1,269 @@
+"""Content-addressed store for uploaded videos, with resumable chunked uploads."""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional
+
+from download_cache import file_lock
+from telemetry import upload_bytes, upload_requests
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+META_FILE = "meta.json"
+DATA_FILE = "data"
+# Unfinished chunked uploads are dropped after this many seconds without a chunk
+DEFAULT_PARTIAL_TTL = 24 * 3600
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadOffsetError(ValueError):
+    """A chunk did not start where the stored upload ends."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class HashingWriter:
+    """
+    Temp file inside the store that hashes data as it is written.
+
+    Used as the werkzeug file stream for multipart uploads, so a file is
+    hashed while it arrives and committing it is just a rename. The temp
+    file is deleted on close unless it was committed.
+    """
+
+    def __init__(self, directory: Path):
+        fd, path = tempfile.mkstemp(prefix='.upload-', dir=directory)
+        self.file = os.fdopen(fd, 'w+b')
+        self.path: Optional[str] = path
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        if not self.file.closed:
+            self.file.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def close(self):
+        self.file.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+class UploadStore:
+    """
+    Uploaded files stored once per content hash under root/objects.
+
+    Each object <sha256><ext> has a <sha256>.json next to it with its size
+    and the filenames it was uploaded as, so re-uploads of the same bytes
+    under any name map to the same object (and its cached transcript).
+    Chunked uploads are assembled under root/partial/<upload_id>. Lock
+    files live in root/.locks so they stay out of the object store.
+    """
+
+    def __init__(self, root: str = "uploads", partial_ttl: float = DEFAULT_PARTIAL_TTL):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.partial_dir = self.root / "partial"
+        self.tmp_dir = self.root / "tmp"
+        self.lock_dir = self.root / ".locks"
+        self.partial_ttl = partial_ttl
+        for directory in (self.objects_dir, self.partial_dir, self.tmp_dir, self.lock_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def open_writer(self) -> HashingWriter:
+        return HashingWriter(self.tmp_dir)
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        """Object metadata with its absolute path, or None if unknown."""
+        if not SHA256_RE.match(sha256 or ''):
+            return None
+        try:
+            with open(self.objects_dir / f"{sha256}.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        path = self.objects_dir / meta['object']
+        if not path.exists():
+            return None
+        return dict(meta, sha256=sha256, path=path)
+
+    def add_stream(self, stream: BinaryIO, filename: str) -> Dict:
+        """
+        Store the file read from stream.
+
+        A HashingWriter (the multipart upload itself) is committed in place;
+        anything else is copied in CHUNK_SIZE pieces. The result has
+        'duplicate' set when the content was already stored.
+        """
+        if isinstance(stream, HashingWriter):
+            return self._commit(stream, filename)
+
+        writer = self.open_writer()
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+            return self._commit(writer, filename)
+        finally:
+            writer.close()
+
+    def create_upload(self, filename: str, size: int) -> Dict:
+        """Start a chunked upload of size bytes."""
+        self.expire_partial()
+        upload_id = uuid.uuid4().hex
+        directory = self.partial_dir / upload_id
+        directory.mkdir()
+        (directory / DATA_FILE).touch()
+        self._write_json(directory / META_FILE,
+                         {'filename': filename, 'size': size, 'created': time.time()})
+        return self.upload_status(upload_id)
+
+    def upload_status(self, upload_id: str) -> Optional[Dict]:
+        """Declared size and bytes received so far, or None if unknown."""
+        if not UPLOAD_ID_RE.match(upload_id or ''):
+            return None
+        directory = self.partial_dir / upload_id
+        try:
+            with open(directory / META_FILE, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            offset = (directory / DATA_FILE).stat().st_size
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return {'upload_id': upload_id, 'filename': meta['filename'],
+                'size': meta['size'], 'offset': offset, 'complete': False}
+
+    def append(self, upload_id: str, offset: int, stream: BinaryIO) -> Optional[Dict]:
+        """
+        Append the chunk read from stream at offset.
+
+        Raises UploadOffsetError if offset is not the current end of the
+        upload (e.g. a retried chunk that already arrived) and ValueError if
+        the chunk runs past the declared size. Once the last byte arrives
+        the file moves into the store and the stored object is returned.
+        """
+        if not UPLOAD_ID_RE.match(upload_id or ''):
+            return None
+        directory = self.partial_dir / upload_id
+        with file_lock(self.lock_dir / f"upload-{upload_id}.lock"):
+            status = self.upload_status(upload_id)
+            if status is None:
+                return None
+            if offset != status['offset']:
+                raise UploadOffsetError(status['offset'])
+
+            start, remaining = offset, status['size'] - offset
+            with open(directory / DATA_FILE, 'ab') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if len(chunk) > remaining:
+                        f.truncate(start)
+                        raise ValueError(f"Chunk runs past the declared size of {status['size']} bytes")
+                    f.write(chunk)
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+            os.utime(directory / META_FILE)
+
+            if remaining:
+                return dict(status, offset=offset)
+
+            # Chunks may have come through different workers, so hash the
+            # assembled file once rather than carrying hash state between them
+            writer = self.open_writer()
+            try:
+                with open(directory / DATA_FILE, 'rb') as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        writer.sha256.update(chunk)
+                        writer.size += len(chunk)
+                writer.file.close()
+                os.replace(directory / DATA_FILE, writer.path)
+                stored = self._commit(writer, status['filename'])
+            finally:
+                writer.close()
+            shutil.rmtree(directory, ignore_errors=True)
+            (self.lock_dir / f"upload-{upload_id}.lock").unlink(missing_ok=True)
+            return dict(stored, upload_id=upload_id, complete=True)
+
+    def expire_partial(self):
+        """Delete chunked uploads that have not received a chunk within partial_ttl."""
+        cutoff = time.time() - self.partial_ttl
+        for meta_path in self.partial_dir.glob(f"*/{META_FILE}"):
+            try:
+                if meta_path.stat().st_mtime < cutoff:
+                    shutil.rmtree(meta_path.parent, ignore_errors=True)
+                    (self.lock_dir / f"upload-{meta_path.parent.name}.lock").unlink(missing_ok=True)
+                    logger.info(f"Dropped stale upload {meta_path.parent.name}")
+            except FileNotFoundError:
+                continue
+
+    def _commit(self, writer: HashingWriter, filename: str) -> Dict:
+        writer.flush()
+        sha256 = writer.sha256.hexdigest()
+        suffix = Path(filename).suffix.lower()
+        with file_lock(self.lock_dir / f"{sha256}.lock"):
+            stored = self.get(sha256)
+            duplicate = stored is not None
+            if duplicate:
+                meta = {key: stored[key] for key in ('object', 'size', 'filenames', 'created')}
+            else:
+                meta = {'object': f"{sha256}{suffix}", 'size': writer.size,
+                        'filenames': [], 'created': time.time()}
+                os.replace(writer.path, self.objects_dir / meta['object'])
+                writer.path = None
+            if filename not in meta['filenames']:
+                meta['filenames'].append(filename)
+                self._write_json(self.objects_dir / f"{sha256}.json", meta)
+
+        upload_requests.inc(result='duplicate' if duplicate else 'new')
+        if not duplicate:
+            upload_bytes.inc(meta['size'])
+        logger.info(f"Stored upload {filename} as {sha256}" + (" (already known)" if duplicate else ""))
+        return dict(self.get(sha256), duplicate=duplicate)
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict):
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+_default_store: Optional[UploadStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Process-wide store rooted at UPLOAD_DIR."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = UploadStore(os.getenv('UPLOAD_DIR', 'uploads'),
+                                         float(os.getenv('UPLOAD_PARTIAL_TTL', DEFAULT_PARTIAL_TTL)))
+        return _default_store
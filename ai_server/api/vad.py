@@ -0,0 +1,188 @@
+"""Energy-based voice activity detection and pause-aware packing of speech into ASR chunks."""
+import logging
+from bisect import bisect_right
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+# Frames this far above the noise floor count as speech...
+THRESHOLD_DB = 12.0
+# ...but never more than this far below the loud end, so wall-to-wall speech is kept
+HEADROOM_DB = 6.0
+# Anything quieter is silence whatever the floor is (dBFS)
+SILENCE_DB = -55.0
+# Share of frame energy in the telephone speech band below which a frame is
+# treated as rumble or hiss rather than voice
+SPEECH_BAND = (300.0, 3400.0)
+MIN_BAND_RATIO = 0.25
+MIN_SPEECH_MS = 250
+# Pauses shorter than this stay inside a speech region
+MIN_SILENCE_MS = 300
+PAD_MS = 200
+# Frames analysed per FFT block, to bound memory on long recordings
+BLOCK_FRAMES = 8192
+
+
+class SpeechChunk:
+    """
+    Speech spans of the source audio packed into one ASR request.
+
+    spans are (start, end) source times in seconds; in the chunk they are
+    laid end to end, and to_source() maps a chunk time back to the source.
+    """
+
+    def __init__(self, spans: List[Tuple[float, float]]):
+        self.spans = spans
+        self.offsets = [0.0]
+        for start, end in spans:
+            self.offsets.append(self.offsets[-1] + end - start)
+
+    @property
+    def start(self) -> float:
+        return self.spans[0][0]
+
+    @property
+    def end(self) -> float:
+        return self.spans[-1][1]
+
+    @property
+    def duration(self) -> float:
+        return self.offsets[-1]
+
+    def to_source(self, t: float) -> float:
+        """Source time of chunk time t (seconds)."""
+        i = min(max(bisect_right(self.offsets, t) - 1, 0), len(self.spans) - 1)
+        start, end = self.spans[i]
+        return min(start + max(t - self.offsets[i], 0.0), end)
+
+    def __repr__(self) -> str:
+        return f"SpeechChunk({self.start:.2f}-{self.end:.2f}s, {len(self.spans)} spans, {self.duration:.2f}s)"
+
+
+def frame_features(samples: np.ndarray, sample_rate: int,
+                   frame_ms: int = FRAME_MS) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy (dBFS) and speech-band energy ratio of mono int16 samples."""
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(samples) // frame
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    band_ratio = np.empty(n_frames, dtype=np.float32)
+    freqs = np.fft.rfftfreq(frame, 1 / sample_rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    window = np.hanning(frame).astype(np.float32)
+
+    for lo in range(0, n_frames, BLOCK_FRAMES):
+        hi = min(lo + BLOCK_FRAMES, n_frames)
+        frames = samples[lo * frame:hi * frame].reshape(hi - lo, frame).astype(np.float32) / 32768.0
+        energy_db[lo:hi] = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        band_ratio[lo:hi] = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+    return energy_db, band_ratio
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the runs of True in mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(energy_db: np.ndarray, band_ratio: np.ndarray, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """
+    Speech/non-speech decision per frame.
+
+    The threshold adapts to the recording's noise floor (10th percentile
+    energy). Short pauses are bridged and speech blips too short to be
+    words are dropped.
+    """
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool)
+    floor, loud = np.percentile(energy_db, [10, 90])
+    threshold = max(min(floor + THRESHOLD_DB, loud - HEADROOM_DB), SILENCE_DB)
+    mask = (energy_db > threshold) & (band_ratio >= MIN_BAND_RATIO)
+
+    starts, ends = _runs(~mask)
+    min_silence = MIN_SILENCE_MS // frame_ms
+    for start, end in zip(starts, ends):
+        if end - start < min_silence and start > 0 and end < len(mask):
+            mask[start:end] = True
+
+    starts, ends = _runs(mask)
+    min_speech = max(1, MIN_SPEECH_MS // frame_ms)
+    for start, end in zip(starts, ends):
+        if end - start < min_speech:
+            mask[start:end] = False
+    return mask
+
+
+def speech_regions(mask: np.ndarray, duration: float, frame_ms: int = FRAME_MS,
+                   pad_ms: int = PAD_MS) -> List[Tuple[float, float]]:
+    """Padded (start, end) seconds of the speech runs in mask, merged where the padding overlaps."""
+    frame_s, pad = frame_ms / 1000, pad_ms / 1000
+    regions: List[Tuple[float, float]] = []
+    for start, end in zip(*_runs(mask)):
+        start, end = max(float(start) * frame_s - pad, 0.0), min(float(end) * frame_s + pad, duration)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def split_long_region(start: float, end: float, energy_db: np.ndarray, max_chunk: float,
+                      frame_ms: int = FRAME_MS) -> List[Tuple[float, float]]:
+    """
+    Cut a region longer than max_chunk at its quietest frames (the latest
+    one within 3 dB of the minimum), each piece at least half max_chunk.
+    """
+    frame_s = frame_ms / 1000
+    pieces = []
+    while end - start > max_chunk:
+        lo = int((start + max_chunk / 2) / frame_s)
+        hi = max(int((start + max_chunk) / frame_s), lo + 1)
+        window = energy_db[lo:hi]
+        if len(window):
+            cut = float(lo + np.flatnonzero(window <= window.min() + 3.0)[-1]) * frame_s
+        else:
+            cut = start + max_chunk
+        cut = min(max(cut, start + frame_s), start + max_chunk)
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def pack_chunks(regions: List[Tuple[float, float]], energy_db: np.ndarray, max_chunk: float,
+                frame_ms: int = FRAME_MS) -> List[SpeechChunk]:
+    """
+    Greedily pack speech regions, in order, into chunks of at most
+    max_chunk seconds of audio. Chunks end between regions (at pauses);
+    only regions longer than max_chunk are cut, at their quietest point.
+    """
+    chunks: List[SpeechChunk] = []
+    spans: List[Tuple[float, float]] = []
+    length = 0.0
+    for start, end in regions:
+        for piece_start, piece_end in split_long_region(start, end, energy_db, max_chunk, frame_ms):
+            piece = piece_end - piece_start
+            if spans and length + piece > max_chunk:
+                chunks.append(SpeechChunk(spans))
+                spans, length = [], 0.0
+            spans.append((piece_start, piece_end))
+            length += piece
+    if spans:
+        chunks.append(SpeechChunk(spans))
+    return chunks
+
+
+def plan_chunks(samples: np.ndarray, sample_rate: int, max_chunk: float) -> List[SpeechChunk]:
+    """Speech chunks of mono int16 samples, each at most max_chunk seconds long."""
+    duration = len(samples) / sample_rate
+    energy_db, band_ratio = frame_features(samples, sample_rate)
+    regions = speech_regions(speech_mask(energy_db, band_ratio), duration)
+    chunks = pack_chunks(regions, energy_db, max_chunk)
+    speech = sum(chunk.duration for chunk in chunks)
+    logger.info(f"VAD kept {speech:.1f}s of {duration:.1f}s audio in {len(chunks)} chunks "
+                f"(fixed slicing: {int(np.ceil(duration / max_chunk))})")
+    return chunks
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark the sentence scorers in scorers.SCORERS.
+
+Scores synthetic transcript sentences with each scorer and reports the
+best wall time, peak traced memory and how many of its top 10% sentences
+the heuristic scorer also ranks in its top 10%. The heuristic needs the
+NLTK tagger; it is skipped above --heuristic-limit sentences.
+
+Usage: python bench_scorers.py --sizes 1000 10000 100000
+"""
+import argparse
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from app import SentenceTable, ensure_nltk_resources  # noqa: E402
+from scorers import SCORERS  # noqa: E402
+from synthetic import make_transcript  # noqa: E402
+
+
+def make_sentences(n: int) -> SentenceTable:
+    """Sentences of a synthetic transcript, about 2.5 words per second."""
+    texts = re.findall(r'[^.]+\.', make_transcript(n))
+    durations = np.array([len(text.split()) / 2.5 for text in texts], dtype=np.float64)
+    starts = np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+    return SentenceTable(texts, starts, starts + durations, durations)
+
+
+def top(scores: np.ndarray) -> set:
+    k = max(1, len(scores) // 10)
+    return set(np.argsort(-scores, kind='stable')[:k].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Number of sentences')
+    parser.add_argument('--scorers', nargs='+', choices=list(SCORERS), default=list(SCORERS))
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the best is reported')
+    parser.add_argument('--heuristic-limit', type=int, default=20000,
+                        help='Skip the heuristic (POS tagging) above this many sentences')
+    args = parser.parse_args()
+    if 'heuristic' in args.scorers:
+        ensure_nltk_resources()
+
+    print(f"{'sentences':>10} {'scorer':>10} {'time (ms)':>10} {'peak MiB':>9} {'top 10% shared':>15}")
+    for size in args.sizes:
+        sentences = make_sentences(size)
+        reference = None
+        for name in args.scorers:
+            if name == 'heuristic' and size > args.heuristic_limit:
+                print(f"{size:>10} {name:>10} {'-':>10} {'-':>9} {'-':>15}")
+                continue
+            scorer = SCORERS[name]
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                scores = scorer(sentences)
+                times.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            scorer(sentences)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            if name == 'heuristic':
+                reference = top(scores)
+            shared = f"{len(top(scores) & reference) / len(reference):.0%}" if reference else '-'
+            print(f"{size:>10} {name:>10} {min(times) * 1000:>10.1f} {peak / 2 ** 20:>9.1f} {shared:>15}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Benchmark budgeted region selection (selection.select_regions).
+
+Times the selection on synthetic scored sentences of each size and
+reports peak traced memory, how much of the budget was used and that the
+video length bound held. With --check it also compares the greedy choice
+with the exact optimum on small instances, found by a 0.1 s-grid
+knapsack DP (sentences are spaced out so nothing merges), and checks
+that overlapping, rolling-caption style intervals are priced by the time
+they add rather than their own length.
+
+Usage: python bench_select.py --sizes 1000 10000 100000 --target 600
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from selection import MERGE_GAP, select_intervals, select_regions  # noqa: E402
+
+
+def make_sentences(n: int, seed: int = 0, min_gap: float = 0.0):
+    """Back-to-back sentences of 0.5-8 s with pauses and scores like score_sentences'."""
+    rng = np.random.default_rng(seed)
+    durations = rng.uniform(0.5, 8.0, n)
+    pauses = rng.uniform(min_gap, min_gap + 2.0, n)
+    starts = np.cumsum(pauses + durations) - durations
+    scores = 0.4 * rng.random(n) + 0.3 * rng.random(n) + 0.3 * np.minimum(1.0, durations / 5)
+    return starts, starts + durations, scores
+
+
+def exact_value(durations: np.ndarray, values: np.ndarray, budget: float, step: float = 0.1) -> float:
+    """Best total value within budget by 0-1 knapsack over a step-second grid (durations rounded up)."""
+    weights = np.ceil(durations / step - 1e-9).astype(int)
+    capacity = int(budget / step + 1e-9)
+    best = np.zeros(capacity + 1)
+    for weight, value in zip(weights, values):
+        if weight <= capacity:
+            best[weight:] = np.maximum(best[weight:], best[:capacity + 1 - weight] + value)
+    return float(best[-1])
+
+
+def check_quality(trials: int, n: int, budget: float):
+    ratios = []
+    for seed in range(trials):
+        # Pauses over the merge gap and 0.1 s-grid durations keep the DP exact
+        starts, ends, scores = make_sentences(n, seed, min_gap=1.0)
+        ends = starts + np.ceil((ends - starts) * 10) / 10
+        chosen, _ = select_intervals(starts, ends, scores, budget)
+        values = scores * (ends - starts)
+        ratios.append(values[chosen].sum() / exact_value(ends - starts, values, budget))
+    print(f"\ngreedy / optimal value over {trials} instances of {n} sentences, {budget:.0f}s budget: "
+          f"min {min(ratios):.3f}, mean {np.mean(ratios):.3f}")
+
+
+def check_overlaps(trials: int, budget: float):
+    # After [0, 10] is chosen, [9, 14] adds only 4 s
+    chosen, regions = select_intervals(np.array([0.0, 9.0]), np.array([10.0, 14.0]),
+                                       np.array([1.0, 0.9]), 14)
+    if len(chosen) != 2 or abs(regions.total - 14) > 1e-6:
+        sys.exit(f"Overlapping interval was not taken: {regions.regions()}")
+
+    # Rolling captions: 4 s cues every 2 s, each overlapping the next by half
+    rng = np.random.default_rng(0)
+    for _ in range(trials):
+        starts = np.arange(0.0, 600.0, 2.0)
+        _, regions = select_intervals(starts, starts + 4.0, rng.random(len(starts)), budget)
+        # Any cue adds at most its length plus a merge gap on each side, so a larger shortfall is a miss
+        if not budget - 4.0 - 2 * MERGE_GAP < regions.total <= budget + 1e-6:
+            sys.exit(f"Rolling captions used {regions.total:.1f}s of a {budget:.0f}s budget")
+    print(f"overlapping intervals: ok ({trials} rolling-caption instances, {budget:.0f}s budget)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Number of scored sentences')
+    parser.add_argument('--target', type=float, default=600, help='Summary length in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best is reported')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare with the exact optimum on small instances')
+    args = parser.parse_args()
+
+    print(f"{'sentences':>10} {'time (ms)':>10} {'peak MiB':>9} {'regions':>8} "
+          f"{'length (s)':>11} {'in video':>9}")
+    for size in args.sizes:
+        starts, ends, scores = make_sentences(size)
+        # Cut the video short of the last sentence to exercise the hard bound
+        video_duration = float(ends[-1]) * 0.9
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            regions = select_regions(starts, ends, scores, args.target, video_duration)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        select_regions(starts, ends, scores, args.target, video_duration)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        length = sum(end - start for start, end in regions)
+        inside = all(0 <= start < end <= video_duration for start, end in regions) and all(
+            end <= next_start for (_, end), (next_start, _) in zip(regions, regions[1:]))
+        if length > args.target + 1e-6 or not inside:
+            sys.exit(f"Selection for {size} sentences broke the budget or the video bounds")
+        print(f"{size:>10} {min(times) * 1000:>10.1f} {peak / 2 ** 20:>9.1f} {len(regions):>8} "
+              f"{length:>11.1f} {'yes' if inside else 'NO':>9}")
+
+    if args.check:
+        check_quality(trials=20, n=300, budget=60)
+        check_overlaps(trials=20, budget=60)
+
+
+if __name__ == '__main__':
+    main()
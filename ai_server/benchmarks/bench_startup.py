@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark server startup time and first-request latency.
+
+Each measurement runs in a fresh interpreter, importing main.py with and
+without the boot-time warm-up, then times the first and second subtitle
+processing calls on a synthetic SRT through the shared summarizer.
+
+Usage: python bench_startup.py --runs 3 --cues 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from synthetic import make_srt
+
+API_DIR = Path(__file__).resolve().parent.parent / 'api'
+
+CHILD = """
+import json, sys, time
+from pathlib import Path
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+client = main.app.test_client()
+client.get('/')
+health = time.perf_counter()
+summarizer = main.get_summarizer()
+summarizer.process_subtitles(Path(sys.argv[1]), 60)
+first = time.perf_counter()
+summarizer.process_subtitles(Path(sys.argv[1]), 60)
+second = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'health': health - imported,
+    'first_request': first - health,
+    'second_request': second - first,
+}))
+"""
+
+
+def measure(srt_path: Path, warm_up: bool) -> dict:
+    env = dict(os.environ, WARM_UP='1' if warm_up else '0')
+    result = subprocess.run([sys.executable, '-c', CHILD, str(srt_path)], cwd=API_DIR,
+                            env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters per mode')
+    parser.add_argument('--cues', type=int, default=2000, help='Cues in the synthetic SRT')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        srt_path = make_srt(Path(tmp) / 'startup.srt', args.cues)
+        print(f"{'mode':>10} {'import (s)':>11} {'health (s)':>11} "
+              f"{'1st req (s)':>12} {'2nd req (s)':>12}")
+        for warm_up in (False, True):
+            runs = [measure(srt_path, warm_up) for _ in range(args.runs)]
+            avg = {k: sum(r[k] for r in runs) / len(runs) for k in runs[0]}
+            print(f"{'warm-up' if warm_up else 'lazy':>10} {avg['import']:>11.3f} "
+                  f"{avg['health']:>11.3f} {avg['first_request']:>12.3f} "
+                  f"{avg['second_request']:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Benchmark batched vs per-sentence scoring in app.summarize().
+
+Usage: python bench_summarize.py --sizes 10000 50000 200000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from app import summarize  # noqa: E402
+from subtitles import parse_subtitles  # noqa: E402
+from synthetic import make_srt  # noqa: E402
+
+
+def run(srt_file, batched: bool):
+    start = time.perf_counter()
+    regions = summarize(srt_file, max(1, len(srt_file) // 50), batched=batched)
+    return regions, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 50000, 200000],
+                        help='Number of subtitle cues per synthetic file')
+    parser.add_argument('--serial-limit', type=int, default=50000,
+                        help='Skip the per-sentence path above this many cues')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'cues':>8} {'serial (s)':>11} {'batched (s)':>12} {'speedup':>8}")
+        for size in args.sizes:
+            srt_path = make_srt(Path(tmp) / f"bench_{size}.srt", size)
+            srt_file = parse_subtitles(srt_path)
+
+            batched_regions, batched_time = run(srt_file, batched=True)
+            if size <= args.serial_limit:
+                serial_regions, serial_time = run(srt_file, batched=False)
+                if serial_regions != batched_regions:
+                    sys.exit(f"Output mismatch for {size} cues")
+                print(f"{size:>8} {serial_time:>11.2f} {batched_time:>12.2f} "
+                      f"{serial_time / batched_time:>7.1f}x")
+            else:
+                print(f"{size:>8} {'-':>11} {batched_time:>12.2f} {'-':>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Benchmark chunked transcription against the offline stub backend.
+
+Compares fixed 25-second slices with VAD speech chunks on synthetic
+lecture audio (music intro, speech bursts, pauses): chunk count, audio
+and encoded bytes sent to the ASR backend, and throughput per worker count.
+
+Usage: python bench_transcribe.py --minutes 60 --latency 0.5 --workers 1 8 16
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from pydub import AudioSegment  # noqa: E402
+
+from synthetic import make_speech_pcm  # noqa: E402
+from transcribe import (SAMPLE_RATE, StubBackend, encode_chunk, split_audio,  # noqa: E402
+                        split_speech, transcribe_chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--minutes', type=float, default=60,
+                        help='Length of the synthetic audio')
+    parser.add_argument('--latency', type=float, default=0.5,
+                        help='Simulated per-request latency of the stub backend')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 16],
+                        help='Concurrency levels to compare')
+    args = parser.parse_args()
+
+    pcm = make_speech_pcm(args.minutes * 60, SAMPLE_RATE)
+    audio = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+    print(f"{args.minutes:.0f} min of audio, raw PCM {len(audio.raw_data) / 1024:.0f} KiB")
+
+    start = time.perf_counter()
+    fixed = split_audio(audio)
+    fixed_time = time.perf_counter() - start
+    start = time.perf_counter()
+    speech, _ = split_speech(audio)
+    speech_time = time.perf_counter() - start
+
+    print(f"{'chunking':>9} {'split (s)':>10} {'chunks':>7} {'audio (s)':>10} {'encoded KiB':>12}")
+    for label, chunks, split_time in (('fixed', fixed, fixed_time), ('vad', speech, speech_time)):
+        seconds = sum(len(chunk) for chunk in chunks) / 1000
+        encoded = sum(len(encode_chunk(chunk).getvalue()) for chunk in chunks)
+        print(f"{label:>9} {split_time:>10.2f} {len(chunks):>7} {seconds:>10.0f} {encoded / 1024:>12.0f}")
+
+    backend = StubBackend(latency=args.latency)
+    print(f"\n{'chunking':>9} {'workers':>8} {'wall (s)':>9} {'chunks/s':>9}")
+    for label, chunks in (('fixed', fixed), ('vad', speech)):
+        for workers in args.workers:
+            start = time.perf_counter()
+            transcribe_chunks(chunks, backend, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>9} {workers:>8} {elapsed:>9.2f} {len(chunks) / elapsed:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
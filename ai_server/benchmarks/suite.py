@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+"""
+Offline benchmark suite for the summarization pipeline.
+
+Every stage runs in a fresh process against synthetic fixtures: SRT files
+of each --cues size and a test video rendered locally with ffmpeg.
+yt_dlp, Whisper and Gemini are replaced by FixtureCache, the stub
+transcription backend and the local provider backend. For each stage the
+suite reports median wall time, CPU time (own and ffmpeg children), peak
+RSS and output size. With --baseline it compares against a stored run and
+exits non-zero on regressions.
+
+Usage:
+    python suite.py --save-baseline baseline.json
+    python suite.py --baseline baseline.json --tolerance 0.25
+    python suite.py --stages summarize optimize_regions --cues 1000 50000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from synthetic import FixtureCache, make_srt, make_transcript, make_video
+
+API_DIR = Path(__file__).resolve().parent.parent / 'api'
+
+# Differences smaller than these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_RSS_MB = 5.0
+
+
+def file_size(path) -> int:
+    return Path(path).stat().st_size if path and Path(path).exists() else 0
+
+
+def test_regions(seconds: float, count: int = 6, length: float = 4.0):
+    """Evenly spaced regions for the render stages (no NLTK needed)."""
+    step = seconds / count
+    return [(i * step + 0.5, min(i * step + 0.5 + length, seconds)) for i in range(count)]
+
+
+def summarizer(fixtures: Dict, out_dir: Path):
+    from app import VideoSummarizer
+    cache = FixtureCache(out_dir / 'cache', fixtures.get('video'), fixtures.get('video_srt'))
+    return VideoSummarizer(output_dir=str(out_dir / 'output'), cache=cache)
+
+
+def stage_parse_subtitles(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    from subtitles import parse_subtitles
+    cues = parse_subtitles(Path(fixtures['srt']))
+    return cues.starts.nbytes + cues.ends.nbytes + cues.offsets.nbytes + len(cues.buffer)
+
+
+def stage_summarize(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    from app import summarize
+    from subtitles import parse_subtitles
+    cues = parse_subtitles(Path(fixtures['srt']))
+    regions = summarize(cues, max(1, len(cues) // 50))
+    return len(json.dumps(regions))
+
+
+def stage_process_subtitles(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    regions = summarizer(fixtures, out_dir).process_subtitles(Path(fixtures['srt']), 60)
+    return len(json.dumps(regions)) if regions else 0
+
+
+def stage_optimize_regions(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    rng = random.Random(0)
+    regions, current = [], 0.0
+    for _ in range(params['cues']):
+        current += rng.uniform(0.5, 3.0)
+        end = current + rng.uniform(1.0, 8.0)
+        regions.append((current, end))
+        current = end
+    optimized = summarizer(fixtures, out_dir).optimize_regions(regions, 600)
+    return len(json.dumps(optimized))
+
+
+def stage_select_regions(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    from bench_select import make_sentences
+    from selection import select_regions
+    starts, ends, scores = make_sentences(params['cues'])
+    return len(json.dumps(select_regions(starts, ends, scores, 600, float(ends[-1]))))
+
+
+def check_frame_accurate(path: Path, regions) -> None:
+    """Decode every frame of path and check it lasts as long as the regions, raising if not."""
+    decoded = subprocess.run(['ffmpeg', '-v', 'error', '-i', str(path), '-f', 'null', '-'],
+                             capture_output=True, text=True)
+    if decoded.returncode or decoded.stderr.strip():
+        raise RuntimeError(f"decode errors: {decoded.stderr.strip()[:200]}")
+    probed = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                             '-of', 'csv=p=0', str(path)], capture_output=True, text=True, check=True)
+    expected = sum(end - start for start, end in regions)
+    # Allow a couple of frames per cut
+    if abs(float(probed.stdout) - expected) > 0.1 * len(regions):
+        raise RuntimeError(f"duration {float(probed.stdout):.2f}s, expected {expected:.2f}s")
+
+
+def render_stage(render_mode: str, frame_accurate: bool = False) -> Callable[[Dict, Path, Dict], int]:
+    def stage(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+        summary = summarizer(fixtures, out_dir)
+        regions = test_regions(params['video_seconds'])
+        try:
+            output = summary.create_summary_video(
+                Path(fixtures['video']), regions,
+                f"bench_{render_mode}.mp4", render_mode, frame_accurate)
+            if output and frame_accurate:
+                check_frame_accurate(output, regions)
+            return file_size(output)
+        finally:
+            summary.cleanup()
+    return stage
+
+
+def stage_render_preview(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    summary = summarizer(fixtures, out_dir)
+    try:
+        return file_size(summary.create_preview_video(
+            Path(fixtures['video']), test_regions(params['video_seconds']), "bench_preview.mp4"))
+    finally:
+        summary.cleanup()
+
+
+def stage_process_video(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    summary = summarizer(fixtures, out_dir)
+    try:
+        return file_size(summary.process_video("fixture://video", 30, render_mode="fast_cut"))
+    finally:
+        summary.cleanup()
+
+
+def stage_transcribe(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    from pydub import AudioSegment
+    from transcribe import StubBackend, transcribe_audio
+    audio = AudioSegment.from_file(fixtures['video'])
+    return len(transcribe_audio(audio, StubBackend(latency=params['provider_latency'])))
+
+
+def stage_map_reduce(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    from mapreduce import map_reduce_summarize
+    from providers import LocalBackend, Provider
+    provider = Provider('gemini', LocalBackend(latency=params['provider_latency']), rate=1000)
+    text = make_transcript(params['cues'])
+    summary = map_reduce_summarize(text, lambda chunk, prompt: provider.complete(prompt + chunk, "gemini-pro"),
+                                   "Summarize: ", max_tokens=6000, max_workers=4)
+    return len(summary)
+
+
+def stage_chat_index(fixtures: Dict, out_dir: Path, params: Dict) -> int:
+    from app import subtitle_lines
+    from retrieval import TranscriptIndexStore, group_segments
+    from subtitles import parse_subtitles
+    store = TranscriptIndexStore(str(out_dir / 'index'))
+    index = store.put(fixtures['srt'], group_segments(subtitle_lines(parse_subtitles(Path(fixtures['srt'])))))
+    for query in ("quantum error correction", "students ask questions", "superposition states"):
+        index.search(query, 5)
+    return file_size(store.path(fixtures['srt']))
+
+
+# name -> (function, fixture kind, required executables/modules, modules imported
+# before timing so import cost is not measured)
+STAGES = {
+    'parse_subtitles': (stage_parse_subtitles, 'cues', (), ('subtitles',)),
+    'summarize': (stage_summarize, 'cues', (), ('app',)),
+    'process_subtitles': (stage_process_subtitles, 'cues', (), ('app',)),
+    'optimize_regions': (stage_optimize_regions, 'cues', (), ('app',)),
+    'select_regions': (stage_select_regions, 'cues', (), ('selection',)),
+    'chat_index': (stage_chat_index, 'cues', (), ('app', 'retrieval')),
+    'map_reduce': (stage_map_reduce, 'cues', (), ('mapreduce', 'providers')),
+    'render_fast_cut': (render_stage('fast_cut'), 'video', ('ffmpeg',), ('app',)),
+    'render_frame_accurate': (render_stage('fast_cut', frame_accurate=True), 'video', ('ffmpeg',), ('app',)),
+    'render_parallel': (render_stage('parallel'), 'video', ('ffmpeg',), ('app',)),
+    'render_hls': (render_stage('hls'), 'video', ('ffmpeg',), ('app',)),
+    'render_preview': (stage_render_preview, 'video', ('ffmpeg',), ('app',)),
+    'render_reencode': (render_stage('reencode'), 'video', ('ffmpeg', 'moviepy'), ('app', 'moviepy.editor')),
+    'transcribe': (stage_transcribe, 'video', ('ffmpeg', 'pydub'), ('pydub', 'transcribe')),
+    'process_video': (stage_process_video, 'video', ('ffmpeg',), ('app', 'yt_dlp')),
+}
+
+
+def missing_requirements(requirements) -> List[str]:
+    import importlib.util
+    missing = []
+    for requirement in requirements:
+        if requirement == 'ffmpeg':
+            if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+                missing.append(requirement)
+        elif importlib.util.find_spec(requirement) is None:
+            missing.append(requirement)
+    return missing
+
+
+def rss_mb(kilobytes: float) -> float:
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return kilobytes / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def run_case(stage: str, fixtures: Dict, params: Dict, work_dir: str, repeat: int) -> Dict:
+    """Run one stage repeat times in this (fresh) process and measure it."""
+    os.chdir(work_dir)
+    os.environ.setdefault('LLM_PROVIDER', 'fake')
+    os.environ.setdefault('TRANSCRIBE_BACKEND', 'stub')
+    os.environ.setdefault('DOWNLOAD_CACHE_DIR', str(Path(work_dir) / 'download_cache'))
+    sys.path.insert(0, str(API_DIR))
+    import importlib
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    fn, _, _, preload = STAGES[stage]
+    for module in preload:
+        importlib.import_module(module)
+    walls, cpus, child_cpus, output = [], [], [], 0
+    for _ in range(repeat):
+        own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        output = fn(fixtures, Path(work_dir), params)
+        walls.append(time.perf_counter() - start)
+        own_after = resource.getrusage(resource.RUSAGE_SELF)
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpus.append(own_after.ru_utime + own_after.ru_stime - own.ru_utime - own.ru_stime)
+        child_cpus.append(children_after.ru_utime + children_after.ru_stime
+                          - children.ru_utime - children.ru_stime)
+
+    return {
+        'status': 'ok' if output else 'failed',
+        'wall_s': statistics.median(walls),
+        'cpu_s': statistics.median(cpus),
+        'child_cpu_s': statistics.median(child_cpus),
+        'peak_rss_mb': rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+        'child_peak_rss_mb': rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss),
+        'output_bytes': output,
+    }
+
+
+def measure(stage: str, fixtures: Dict, params: Dict, repeat: int) -> Dict:
+    """Run a case in a spawned interpreter so peak RSS covers only that stage."""
+    with tempfile.TemporaryDirectory(prefix=f"bench_{stage}_") as work_dir:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            try:
+                return pool.submit(run_case, stage, fixtures, params, work_dir, repeat).result()
+            except Exception as e:
+                return {'status': f"error: {type(e).__name__}: {' '.join(str(e).split())[:80]}"}
+
+
+def compare(result: Dict, baseline: Optional[Dict], tolerance: float) -> List[str]:
+    """Metrics that got worse than baseline by more than tolerance."""
+    if not baseline or result.get('status') != 'ok' or baseline.get('status') != 'ok':
+        return []
+    regressions = []
+    for metric, floor in (('wall_s', MIN_SECONDS), ('cpu_s', MIN_SECONDS), ('peak_rss_mb', MIN_RSS_MB)):
+        new, old = result[metric], baseline[metric]
+        if new > old * (1 + tolerance) and new - old > floor:
+            regressions.append(f"{metric} {old:.3g} -> {new:.3g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--cues', type=int, nargs='+', default=[1000, 10000],
+                        help='Sizes (subtitle cues / transcript sentences) for the text stages')
+    parser.add_argument('--video-seconds', type=float, default=60,
+                        help='Length of the generated test video')
+    parser.add_argument('--provider-latency', type=float, default=0.05,
+                        help='Simulated latency of the stub Whisper/Gemini backends')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the median is reported')
+    parser.add_argument('--baseline', help='Compare against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown/growth before a metric counts as a regression')
+    parser.add_argument('--save-baseline', help='Write the results to this file')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results: Dict[str, Dict] = {}
+    regressions: Dict[str, List[str]] = {}
+    with tempfile.TemporaryDirectory(prefix="bench_fixtures_") as tmp:
+        tmp = Path(tmp)
+        srts = {size: str(make_srt(tmp / f"cues_{size}.srt", size)) for size in args.cues}
+        fixtures = {}
+        if not missing_requirements(('ffmpeg',)):
+            fixtures['video'] = str(make_video(tmp / "video.mp4", args.video_seconds))
+            fixtures['video_srt'] = str(make_srt(tmp / "video.srt", max(1, int(args.video_seconds / 5))))
+
+        print(f"{'case':<26} {'status':<8} {'wall (s)':>9} {'cpu (s)':>8} {'child cpu':>10} "
+              f"{'rss (MB)':>9} {'output (KB)':>12}  vs baseline")
+        for stage in args.stages:
+            _, kind, requirements, _ = STAGES[stage]
+            sizes = args.cues if kind == 'cues' else [int(args.video_seconds)]
+            for size in sizes:
+                case = f"{stage}@{size}"
+                missing = missing_requirements(requirements)
+                if missing:
+                    results[case] = {'status': f"skipped: needs {', '.join(missing)}"}
+                else:
+                    params = {'cues': size, 'video_seconds': args.video_seconds,
+                              'provider_latency': args.provider_latency}
+                    results[case] = measure(stage, dict(fixtures, srt=srts.get(size)), params, args.repeat)
+                result = results[case]
+
+                if result['status'] != 'ok':
+                    print(f"{case:<26} {result['status']}")
+                    continue
+                regressions[case] = compare(result, baseline.get(case), args.tolerance)
+                if case not in baseline:
+                    verdict = "-"
+                elif regressions[case]:
+                    verdict = "REGRESSION: " + "; ".join(regressions[case])
+                else:
+                    verdict = f"{result['wall_s'] / max(baseline[case]['wall_s'], 1e-9):.2f}x wall"
+                print(f"{case:<26} {result['status']:<8} {result['wall_s']:>9.3f} {result['cpu_s']:>8.3f} "
+                      f"{result['child_cpu_s']:>10.3f} {max(result['peak_rss_mb'], result['child_peak_rss_mb']):>9.1f} "
+                      f"{result['output_bytes'] / 1024:>12.1f}  {verdict}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'meta': {'created': time.time(), 'python': platform.python_version(),
+                                'machine': platform.machine(), 'cpus': os.cpu_count(),
+                                'args': vars(args)},
+                       'results': results}, f, indent=2)
+        print(f"Saved results to {args.save_baseline}")
+
+    if any(regressions.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,7 @@ import {
 import { ScrollArea } from "../../components/ui/scroll-area";
 import { Input } from "../../components/ui/input";
 import { VisuallyHidden } from '@radix-ui/react-visually-hidden';
+import { getSessionId } from "../../lib/session";
 
 export default function Chatbot() {
   const [messages, setMessages] = useState([
@@ -78,6 +79,7 @@ export default function Chatbot() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "X-Session-ID": getSessionId(),
         },
         body: JSON.stringify(payload),
       });
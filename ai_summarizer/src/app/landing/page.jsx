@@ -10,6 +10,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { useTheme } from 'next-themes';
 import BackgroundLinesDemo from '../background/page';
 import Chatbot from '../bot/page';
+import { getSessionId } from '@/lib/session';
 
 const API_URL = 'http://127.0.0.1:5000/summarize';
 const CLIP_API_URL = 'http://127.0.0.1:5000/summarize_video';
@@ -41,6 +42,9 @@ const LandingPage = () => {
     try {
       const response = await fetch(API_URL, {
         method: 'POST',
+        headers: {
+          'X-Session-ID': getSessionId(),
+        },
         body: formData,
       });
 
@@ -74,6 +78,7 @@ const LandingPage = () => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-ID': getSessionId(),
         },
         body: JSON.stringify({ url: youtubeUrl, language:language }),
       });
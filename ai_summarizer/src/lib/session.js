@@ -0,0 +1,10 @@
+// One ID per browser tab, sent as X-Session-ID so the chatbot answers
+// about the video this tab summarized
+export function getSessionId() {
+    let id = sessionStorage.getItem("summarizerSessionId")
+    if (!id) {
+        id = crypto.randomUUID().replace(/-/g, "")
+        sessionStorage.setItem("summarizerSessionId", id)
+    }
+    return id
+}